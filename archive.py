@@ -0,0 +1,467 @@
+"""Binary archives of exported orders, read through mmap
+
+An archive holds many orders in fixed size records, so reports can scan
+millions of quotes as NumPy views of the mapped file without parsing any
+text. Every section starts on an eight byte boundary:
+
+    header    magic, version, record sizes, counts and section offsets
+    orders    the index, one ORDER_DTYPE record per order, pointing at its
+              run of quotes
+    quotes    one QUOTE_DTYPE record per quote line
+    strings   offsets of each string, then their UTF-8 text
+
+Stores, dates, colours and labels are held once in the string table and
+referred to by number. Quotes whose summary was cut short in a text
+export keep their old total but are flagged as unpriced.
+
+    python archive.py build exports/ -o 2025.qar
+    python archive.py report 2025.qar --tariffs tariffs.json
+"""
+
+import argparse
+import math
+import mmap
+import struct
+import sys
+
+import numpy as np
+
+import batch
+import cli
+import pricing
+import reprice
+
+MAGIC = b"QARC"
+VERSION = 1
+HEADER = struct.Struct("<4sHHHHQQQQQQ")
+ALIGNMENT = 8
+
+ORDER_DTYPE = np.dtype(
+    [
+        ("subtotal", "<i8"),
+        ("first", "<u8"),  # Index of the order's first quote
+        ("count", "<u4"),
+        ("order", "<u4"),  # String numbers
+        ("store", "<u4"),
+        ("date", "<u4"),
+    ]
+)
+QUOTE_DTYPE = np.dtype(
+    [
+        ("x", "<f8"),  # NaN when not numeric
+        ("y", "<f8"),
+        ("z", "<f8"),
+        ("total", "<i8"),  # Pence, as exported
+        ("order", "<u4"),  # Index into the orders section
+        ("label", "<u4"),  # String number
+        ("label_length", "<i4"),
+        ("colour", "<u2"),  # String number
+        ("shape", "i1"),
+        ("quality", "i1"),
+        ("bow", "?"),
+        ("includes_label", "?"),
+        ("flags", "u1"),
+        ("reserved", "V5"),
+    ]
+)
+UNPRICED = 1  # Flag for quotes which cannot be priced again
+
+
+class ArchiveError(ValueError):
+    """Raised when a file is not a readable order archive"""
+
+
+def _padding(offset: int) -> int:
+    return -offset % ALIGNMENT
+
+
+def _number(value) -> float:
+    number = pricing.parse_number(value)
+    return math.nan if number is None else number
+
+
+def _dimension(value: float):
+    return "" if math.isnan(value) else value
+
+
+class _Strings:
+    """String table built up while writing, numbering each string once"""
+
+    def __init__(self) -> None:
+        self.numbers = {"": 0}
+        self.encoded = [b""]
+
+    def number(self, text) -> int:
+        text = "" if text is None else str(text)
+        number = self.numbers.get(text)
+        if number is None:
+            number = self.numbers[text] = len(self.encoded)
+            self.encoded.append(text.encode("utf-8"))
+        return number
+
+
+def write_archive(path: str, orders) -> tuple:
+    """Writes orders to an archive file, returning (orders, quotes) written
+
+    Orders are (order, store, date, subtotal, lines) tuples, where lines
+    are (quote record, total) pairs with a record of None for quotes that
+    cannot be priced again. A subtotal of None is taken as the sum of the
+    line totals.
+    """
+    strings = _Strings()
+    index = []
+    chunks = []
+    first = 0
+
+    for number, (order, store, date, subtotal, lines) in enumerate(orders):
+        quotes = np.zeros(len(lines), dtype=QUOTE_DTYPE)
+        quotes["order"] = number
+        quotes["total"] = [total for _, total in lines]
+
+        priced = [
+            (row, record)
+            for row, (record, _) in enumerate(lines)
+            if record is not None
+        ]
+        quotes["flags"] = UNPRICED
+        quotes["x"] = quotes["y"] = quotes["z"] = math.nan
+        if priced:
+            rows = [row for row, _ in priced]
+            records = [record for _, record in priced]
+            quotes["flags"][rows] = 0
+            for field in ("x", "y", "z"):
+                quotes[field][rows] = [
+                    _number(getattr(record.gift, field)) for record in records
+                ]
+            columns = {
+                "shape": [record.gift.shape for record in records],
+                "quality": [record.wrap.quality for record in records],
+                "colour": [
+                    strings.number(record.wrap.colour) for record in records
+                ],
+                "bow": [record.includes_bow for record in records],
+                "includes_label": [
+                    record.includes_label for record in records
+                ],
+                "label": [
+                    strings.number(record.label_text) for record in records
+                ],
+                "label_length": [len(record.label_text) for record in records],
+            }
+            for field, values in columns.items():
+                quotes[field][rows] = values
+
+        if subtotal is None:
+            subtotal = int(quotes["total"].sum())
+        index.append(
+            (
+                subtotal,
+                first,
+                len(quotes),
+                strings.number(order),
+                strings.number(store),
+                strings.number(date),
+            )
+        )
+        chunks.append(quotes)
+        first += len(quotes)
+
+    orders = np.array(index, dtype=ORDER_DTYPE)
+    offsets = np.zeros(len(strings.encoded) + 1, dtype="<u8")
+    offsets[1:] = np.cumsum([len(text) for text in strings.encoded])
+
+    orders_offset = HEADER.size + _padding(HEADER.size)
+    quotes_offset = orders_offset + orders.nbytes
+    strings_offset = quotes_offset + first * QUOTE_DTYPE.itemsize
+    header = HEADER.pack(
+        MAGIC,
+        VERSION,
+        ORDER_DTYPE.itemsize,
+        QUOTE_DTYPE.itemsize,
+        0,
+        len(orders),
+        first,
+        len(strings.encoded),
+        orders_offset,
+        quotes_offset,
+        strings_offset,
+    )
+
+    with open(path, "wb") as stream:
+        stream.write(header + bytes(_padding(HEADER.size)))
+        stream.write(orders.tobytes())
+        for quotes in chunks:
+            stream.write(quotes.tobytes())
+        stream.write(offsets.tobytes())
+        stream.writelines(strings.encoded)
+    return len(orders), first
+
+
+class Archive:
+    """Read-only view of an archive file mapped into memory
+
+    The orders and quotes attributes are NumPy views straight onto the
+    mapping, so nothing is copied until it is read. Views taken from them
+    must be released before the archive is closed.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as stream:
+            try:
+                self._map = mmap.mmap(
+                    stream.fileno(), 0, access=mmap.ACCESS_READ
+                )
+            except ValueError:  # Empty files cannot be mapped
+                raise ArchiveError(f"{path}: not an order archive") from None
+
+        try:
+            self._read_sections()
+        except ArchiveError:
+            self._map.close()
+            raise
+
+    def _read_sections(self) -> None:
+        if len(self._map) < HEADER.size:
+            raise ArchiveError(f"{self.path}: not an order archive")
+        (
+            magic,
+            version,
+            order_size,
+            quote_size,
+            _,
+            orders,
+            quotes,
+            strings,
+            orders_offset,
+            quotes_offset,
+            strings_offset,
+        ) = HEADER.unpack_from(self._map)
+
+        if magic != MAGIC:
+            raise ArchiveError(f"{self.path}: not an order archive")
+        if version != VERSION or (order_size, quote_size) != (
+            ORDER_DTYPE.itemsize,
+            QUOTE_DTYPE.itemsize,
+        ):
+            raise ArchiveError(
+                f"{self.path}: unsupported archive version {version}"
+            )
+
+        size = len(self._map)
+        data_offset = strings_offset + (strings + 1) * 8
+        if (
+            orders_offset + orders * ORDER_DTYPE.itemsize > size
+            or quotes_offset + quotes * QUOTE_DTYPE.itemsize > size
+            or data_offset > size
+        ):
+            raise ArchiveError(f"{self.path}: archive is truncated")
+        (data_size,) = struct.unpack_from("<Q", self._map, data_offset - 8)
+        if data_offset + data_size > size:
+            raise ArchiveError(f"{self.path}: archive is truncated")
+
+        self.orders = np.frombuffer(
+            self._map, ORDER_DTYPE, orders, orders_offset
+        )
+        self.quotes = np.frombuffer(
+            self._map, QUOTE_DTYPE, quotes, quotes_offset
+        )
+        self._offsets = np.frombuffer(
+            self._map, "<u8", strings + 1, strings_offset
+        )
+        self._data_offset = data_offset
+
+    def close(self) -> None:
+        self.orders = self.quotes = self._offsets = None
+        self._map.close()
+
+    def __enter__(self) -> object:
+        return self
+
+    def __exit__(self, *exception) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.orders)
+
+    def string(self, number: int) -> str:
+        start = self._data_offset + int(self._offsets[number])
+        end = self._data_offset + int(self._offsets[number + 1])
+        return self._map[start:end].decode("utf-8")
+
+    def order(self, index: int) -> dict:
+        """Returns the order, store, date and subtotal of one order"""
+        order = self.orders[index]
+        return {
+            "order": self.string(order["order"]),
+            "store": self.string(order["store"]),
+            "date": self.string(order["date"]),
+            "subtotal": int(order["subtotal"]),
+        }
+
+    def order_quotes(self, index: int) -> np.ndarray:
+        """Returns a view of the quotes of one order"""
+        order = self.orders[index]
+        first = int(order["first"])
+        return self.quotes[first : first + int(order["count"])]
+
+    def record(self, quote: np.void) -> pricing.QuoteRecord:
+        """Returns an archived quote as a record, or None if it cannot be
+        priced again"""
+        if quote["flags"] & UNPRICED:
+            return None
+        return pricing.QuoteRecord(
+            pricing.GiftRecord(
+                int(quote["shape"]),
+                _dimension(float(quote["x"])),
+                _dimension(float(quote["y"])),
+                _dimension(float(quote["z"])),
+            ),
+            pricing.WrapRecord(
+                self.string(quote["colour"]), int(quote["quality"])
+            ),
+            int(quote["includes_label"]),
+            self.string(quote["label"]),
+            int(quote["bow"]),
+        )
+
+    def lines(self, index: int) -> list:
+        """Returns the (quote record, total) lines of one order"""
+        return [
+            (self.record(quote), int(quote["total"]))
+            for quote in self.order_quotes(index)
+        ]
+
+    def store_numbers(self) -> dict:
+        """Returns the string number of each store in the archive"""
+        return {
+            self.string(number): int(number)
+            for number in np.unique(self.orders["store"])
+        }
+
+    def totals(self, tariff: pricing.Tariff = None) -> np.ndarray:
+        """Returns the current price of every quote in pence, keeping the
+        exported total of unpriced quotes"""
+        quotes = self.quotes
+        totals = batch.quote_totals(
+            quotes["shape"],
+            quotes["x"],
+            quotes["y"],
+            quotes["z"],
+            quotes["quality"],
+            quotes["bow"],
+            quotes["includes_label"],
+            quotes["label_length"],
+            tariff=tariff,
+        )
+        unpriced = (quotes["flags"] & UNPRICED).astype(np.bool_)
+        totals[unpriced] = quotes["total"][unpriced]
+        return totals
+
+
+def convert(paths, output: str, on_error=None) -> tuple:
+    """Converts export files into one archive, returning (orders, quotes)
+
+    Files and lines that cannot be read are skipped, and passed to
+    on_error(path, error) when it is given.
+    """
+
+    def orders():
+        for path in reprice.find_exports(paths):
+            try:
+                order, lines = reprice.read_order(path)
+            except (
+                OSError,
+                UnicodeDecodeError,
+                reprice.RepriceError,
+            ) as error:
+                if on_error is not None:
+                    on_error(path, error)
+                continue
+
+            readable = []
+            for line in lines:
+                if isinstance(line, reprice.RepriceError):
+                    if on_error is not None:
+                        on_error(path, line)
+                else:
+                    readable.append(line)
+            yield (
+                order["order"],
+                order["store"],
+                order["date"],
+                order["subtotal"],
+                readable,
+            )
+
+    return write_archive(output, orders())
+
+
+def report(archive: Archive, tariff: pricing.Tariff = None) -> str:
+    """Returns a table of orders, quotes and totals for each store"""
+    orders = archive.orders
+    quotes = archive.quotes
+    stores = orders["store"][quotes["order"]]
+    totals = archive.totals(tariff)
+
+    lines = [
+        f"{'Store':<20}{'Orders':>8}{'Quotes':>10}"
+        f"{'Exported':>16}{'Current':>16}"
+    ]
+    for store, number in sorted(archive.store_numbers().items()):
+        in_store = stores == number
+        exported = int(quotes["total"][in_store].sum())
+        current = int(totals[in_store].sum())
+        lines.append(
+            f"{store or '(unknown)':<20}"
+            f"{np.count_nonzero(orders['store'] == number):>8}"
+            f"{np.count_nonzero(in_store):>10}"
+            f"{pricing.display_pounds(exported):>16}"
+            f"{pricing.display_pounds(current):>16}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Build and report on binary archives of orders."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="convert exports to an archive")
+    build.add_argument(
+        "paths", nargs="+", help="export files or directories of exports"
+    )
+    build.add_argument("-o", "--output", required=True, help="archive file")
+
+    summary = commands.add_parser("report", help="summarise an archive")
+    summary.add_argument("archive", help="archive file")
+    cli.add_tariff_arguments(summary)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        failures = 0
+
+        def skip(path: str, error: Exception) -> None:
+            nonlocal failures
+            failures += 1
+            sys.stderr.write(f"{path}: {error}\n")
+
+        orders, quotes = convert(args.paths, args.output, skip)
+        sys.stderr.write(
+            f"{orders} orders and {quotes} quotes written to {args.output}\n"
+        )
+        return 1 if failures else 0
+
+    tariff = cli.load_tariff(summary, args)
+    try:
+        archive = Archive(args.archive)
+    except (OSError, ArchiveError) as error:
+        parser.error(str(error))
+    with archive:
+        sys.stdout.write(report(archive, tariff) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
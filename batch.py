@@ -0,0 +1,139 @@
+"""Vectorised pricing for large batches of quotes
+
+Every function takes equal length columns and mirrors the scalar rules in
+pricing.py, row for row. Unparseable dimensions are represented as NaN.
+"""
+import numpy as np
+
+import pricing
+
+NAN = float("nan")
+
+
+def _column(values, dtype) -> np.ndarray:
+    """Returns values as an array of the dtype's kind, leaving arrays that
+    already are one uncopied, whatever their width"""
+    if (
+        isinstance(values, np.ndarray)
+        and values.dtype.kind == np.dtype(dtype).kind
+    ):
+        return values
+    return np.asarray(values, dtype=dtype)
+
+
+def _price_lookup(prices) -> np.ndarray:
+    """Returns a dense array indexed by paper quality, from a dict or a
+    sequence of prices"""
+    if not isinstance(prices, dict):
+        return np.asarray(prices, dtype=np.float64)
+    lookup = np.full(max(prices) + 1, np.nan)
+    for quality, price in prices.items():
+        lookup[quality] = price
+    return lookup
+
+
+def sheet_areas(shapes, x, y, z, overlap: float = None) -> np.ndarray:
+    """Returns the paper required to wrap each gift in CM2"""
+    shapes = _column(shapes, np.int64)
+    x = _column(x, np.float64)
+    y = _column(y, np.float64)
+    z = _column(z, np.float64)
+    overlap = 2 * (pricing.OVERLAP if overlap is None else overlap)
+
+    cube = shapes == 0
+    cuboid = shapes == 1
+    cylinder = ~(cube | cuboid)
+
+    with np.errstate(invalid="ignore", over="ignore"):
+        # Sheet size per shape, evaluated in the same order as sheet_area
+        width = np.where(
+            cube,
+            x * 4,
+            np.where(cuboid, (x * 2) + (y * 2), x * np.pi),
+        )
+        height = np.where(
+            cube,
+            x * 3,
+            np.where(cuboid, (y * 2) + z, (x * 2) + y),
+        )
+        area = (width + overlap) * (height + overlap)
+
+    # Rows the scalar path prices at 0
+    invalid = (
+        (cube & np.isnan(x))
+        | (cuboid & (np.isnan(x) | np.isnan(y) | np.isnan(z)))
+        | (cylinder & (np.isnan(x) | np.isnan(y)))
+    )
+    zero = (
+        (cube & (x == 0))
+        | (cuboid & ((x == 0).astype(np.int8) + (y == 0) + (z == 0) > 1))
+        | (cylinder & ((x == 0) | (y == 0)))
+    )
+    area[invalid | zero] = 0
+    return area
+
+
+def quote_totals(
+    shapes,
+    x,
+    y,
+    z,
+    qualities,
+    bows,
+    labels,
+    label_lengths,
+    prices: dict = None,
+    overlap: float = None,
+    tariff: pricing.Tariff = None,
+) -> np.ndarray:
+    """Returns the cost of each quote in pence, with the same tariff rules
+    as pricing.quote_total"""
+    tariff = pricing.DEFAULT_TARIFF if tariff is None else tariff
+    prices = tariff.prices if prices is None else prices
+    overlap = tariff.overlap if overlap is None else overlap
+    qualities = _column(qualities, np.int64)
+
+    paper = sheet_areas(shapes, x, y, z, overlap) * _price_lookup(prices)[
+        qualities
+    ]
+
+    # Always round half up, as in the scalar path
+    totals = np.ceil(paper).astype(np.int64)
+    totals += _column(bows, np.bool_) * tariff.bow_price
+    totals += _column(labels, np.bool_) * (
+        tariff.label_price
+        + tariff.label_character_price * _column(label_lengths, np.int64)
+    )
+    return totals
+
+
+def columns_from_records(records) -> dict:
+    """Returns quote records as keyword columns for quote_totals"""
+    columns = {
+        "shapes": [],
+        "x": [],
+        "y": [],
+        "z": [],
+        "qualities": [],
+        "bows": [],
+        "labels": [],
+        "label_lengths": [],
+    }
+    for record in records:
+        gift = record.gift
+        dimensions = pricing.parse_dimensions(
+            gift.shape, gift.x, gift.y, gift.z
+        )
+        if dimensions is None:
+            dimensions = (NAN, NAN, NAN)
+        dimensions += (NAN,) * (3 - len(dimensions))
+
+        columns["shapes"].append(gift.shape)
+        columns["x"].append(dimensions[0])
+        columns["y"].append(dimensions[1])
+        columns["z"].append(dimensions[2])
+        columns["qualities"].append(record.wrap.quality)
+        columns["bows"].append(record.includes_bow)
+        columns["labels"].append(record.includes_label)
+        columns["label_lengths"].append(len(record.label_text))
+    return columns
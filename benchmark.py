@@ -0,0 +1,320 @@
+"""Pricing benchmarks with regression thresholds
+
+Times the pricing and export hot paths on synthetic orders covering every
+gift shape, both paper qualities and a range of label lengths. Tk variables
+are backed by a bare Tcl interpreter, so no display is needed.
+
+    python benchmark.py --save baseline.json
+    python benchmark.py --compare baseline.json --threshold 15
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import tkinter as tk
+
+import columnar
+import main as app
+import pricing
+
+SIZES = [1, 10, 100, 1000, 10000, 100000]  # Order lines
+LABEL_LENGTHS = [0, 8, 20, 32]
+SAMPLES = 2000  # Calls timed for each quote level function
+REPEATS = 20  # Most calls timed for each order level function
+THRESHOLD = 10  # Percentage slowdown counted as a regression
+STRESS_THREADS = 4  # Mutator and reader threads each
+STRESS_OPERATIONS = 2000  # Changes posted by each mutator thread
+
+
+def use_headless_interpreter() -> None:
+    """Lets tk variables be created without a display"""
+    if tk._default_root is None:
+        tk._default_root = tk.Tcl()
+
+
+def synthetic_quote(rng: random.Random) -> app.Quote:
+    shape = rng.choice(list(app.Gift.SHAPES))
+    label_length = rng.choice(LABEL_LENGTHS)
+    return app.Quote(
+        gift=app.Gift(
+            shape=shape,
+            x=round(rng.uniform(1, app.Gift.MAX_SIZE), 1),
+            y=round(rng.uniform(1, app.Gift.MAX_SIZE), 1),
+            z=round(rng.uniform(1, app.Gift.MAX_SIZE), 1),
+        ),
+        wrap=app.Wrap(
+            colour=rng.choice(app.Wrap.COLOURS),
+            quality=rng.randrange(len(app.Quote.tariff.prices)),
+        ),
+        includes_label=int(label_length > 0),
+        label_text="L" * label_length,
+        includes_bow=rng.randint(0, 1),
+    )
+
+
+def synthetic_order(size: int, rng: random.Random) -> app.Order:
+    order = app.Order()
+    order.extend(synthetic_quote(rng) for _ in range(size))
+    return order
+
+
+def measure(function, arguments: list) -> dict:
+    """Returns throughput and latency percentiles for one call per argument"""
+    timings = []
+    for argument in arguments:
+        start = time.perf_counter_ns()
+        function(argument)
+        timings.append(time.perf_counter_ns() - start)
+
+    timings.sort()
+
+    def percentile(fraction: float) -> float:
+        index = min(len(timings) - 1, int(fraction * len(timings)))
+        return timings[index] / 1000
+
+    return {
+        "calls": len(timings),
+        "throughput": len(timings) / (sum(timings) / 1e9 or 1e-9),
+        "p50": percentile(0.5),
+        "p90": percentile(0.9),
+        "p99": percentile(0.99),
+    }
+
+
+def run(sizes: list, seed: int = 0) -> dict:
+    """Returns measurements keyed by benchmark name"""
+    rng = random.Random(seed)
+    results = {}
+
+    quotes = [synthetic_quote(rng) for _ in range(SAMPLES)]
+    results["Gift.wrap"] = measure(
+        app.Gift.wrap, [quote.gift for quote in quotes]
+    )
+    results["Quote.get_total"] = measure(app.Quote.get_total, quotes)
+    results["Quote.__str__"] = measure(app.Quote.__str__, quotes)
+
+    with open(os.devnull, "w") as devnull:
+        for size in sizes:
+            order = synthetic_order(size, rng)
+            repeats = [order] * max(3, min(REPEATS, 100000 // size))
+
+            results[f"Order.get_total[{size}]"] = measure(
+                app.Order.get_total, repeats
+            )
+            results[f"Order.export[{size}]"] = measure(
+                lambda order: order.export(devnull), repeats
+            )
+
+            records = [quote.record() for quote in order]
+            totals = [order.get_price(quote) for quote in order]
+            results[f"summarise_all[{size}]"] = measure(
+                lambda order: pricing.summarise_all(records, totals), repeats
+            )
+
+            columns = columnar.ColumnarOrder(records)
+            results[f"ColumnarOrder.totals[{size}]"] = measure(
+                columnar.ColumnarOrder.totals, [columns] * len(repeats)
+            )
+            order.clear()
+
+    return results
+
+
+def _check_snapshot(snapshot: app.OrderSnapshot) -> str:
+    """Returns why a snapshot is inconsistent, or None if it is not"""
+    if len(snapshot.records) != len(snapshot.prices):
+        return "records and prices differ in length"
+    if sum(snapshot.prices) != snapshot.subtotal:
+        return "subtotal is not the sum of its prices"
+    for record, price in zip(snapshot.records, snapshot.prices):
+        if pricing.quote_total(record, tariff=app.Quote.tariff) != price:
+            return "price does not match its record"
+    return None
+
+
+def stress(
+    threads: int = STRESS_THREADS,
+    operations: int = STRESS_OPERATIONS,
+    seed: int = 0,
+) -> dict:
+    """Changes an order from several threads at once while others read it
+
+    Mutator threads post random changes through an UpdateQueue, which the
+    calling thread drains as the Tk main loop would, and reader threads
+    check every snapshot they take. Returns counts of operations,
+    snapshots and inconsistencies found.
+    """
+    rng = random.Random(seed)
+    quotes = [synthetic_quote(rng) for _ in range(64)]
+    order = app.Order()
+    updates = app.UpdateQueue()
+    failures = []
+    snapshots = [0] * threads
+    finished = threading.Event()
+
+    def change(operation: str, position: float, quote: app.Quote) -> None:
+        index = int(position * len(order))
+        if operation == "append":
+            order.append(quote)
+        elif operation == "insert":
+            order.insert(index, quote)
+        elif operation == "clear" and len(order) > 32:
+            order.clear()
+        elif not order:
+            return
+        elif operation == "pop":
+            order.pop(index)
+        elif operation == "replace":
+            order[index] = quote
+        elif operation == "edit":
+            order[index].label_text.set("L" * int(position * 32))
+
+    def mutate(number: int) -> None:
+        thread_rng = random.Random(seed + number)
+        choices = ["append", "insert", "pop", "replace", "edit", "clear"]
+        weights = [4, 4, 3, 2, 4, 1]
+        for _ in range(operations):
+            updates.post(
+                change,
+                thread_rng.choices(choices, weights)[0],
+                thread_rng.random(),
+                thread_rng.choice(quotes),
+            )
+
+    def read(number: int) -> None:
+        version = -1
+        while not finished.is_set():
+            snapshot = order.snapshot()
+            problem = _check_snapshot(snapshot)
+            if snapshot.version < version:
+                problem = "snapshot version went backwards"
+            if problem is not None:
+                failures.append(problem)
+            version = snapshot.version
+            snapshots[number] += 1
+
+    mutators = [
+        threading.Thread(target=mutate, args=(number,))
+        for number in range(threads)
+    ]
+    readers = [
+        threading.Thread(target=read, args=(number,))
+        for number in range(threads)
+    ]
+    started = time.perf_counter()
+    for thread in readers + mutators:
+        thread.start()
+
+    applied = 0
+    while any(thread.is_alive() for thread in mutators):
+        applied += updates.drain()
+        time.sleep(0.001)
+    applied += updates.drain()
+    finished.set()
+    for thread in readers:
+        thread.join()
+
+    problem = _check_snapshot(order.snapshot())
+    if problem is not None:
+        failures.append(problem)
+    if order.get_total() != sum(quote.get_total() for quote in order):
+        failures.append("order total does not match its quotes")
+
+    return {
+        "operations": applied,
+        "snapshots": sum(snapshots),
+        "versions": order.snapshot().version,
+        "failures": failures,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Returns (name, baseline p50, p50, slowdown %) for each benchmark
+    whose median latency regressed by more than the threshold"""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before, after = baseline[name]["p50"], result["p50"]
+        slowdown = (after - before) / before * 100 if before else 0
+        if slowdown > threshold:
+            regressions.append((name, before, after, slowdown))
+    return regressions
+
+
+def report(results: dict, stream=sys.stdout) -> None:
+    stream.write(
+        f"{'Benchmark':<28}{'calls/s':>14}{'p50 us':>12}"
+        f"{'p90 us':>12}{'p99 us':>12}\n"
+    )
+    for name, result in results.items():
+        stream.write(
+            f"{name:<28}{result['throughput']:>14,.0f}"
+            f"{result['p50']:>12.1f}{result['p90']:>12.1f}"
+            f"{result['p99']:>12.1f}\n"
+        )
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark quote pricing.")
+    parser.add_argument(
+        "--sizes",
+        type=lambda value: [int(size) for size in value.split(",")],
+        default=SIZES,
+        help="comma separated order sizes (default: 1 to 100000)",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", help="write results to a baseline file")
+    parser.add_argument("--compare", help="baseline file to check against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=THRESHOLD,
+        help=f"allowed slowdown in percent (default: {THRESHOLD})",
+    )
+    parser.add_argument(
+        "--stress",
+        action="store_true",
+        help="check order snapshots while other threads change the order",
+    )
+    args = parser.parse_args(argv)
+
+    use_headless_interpreter()
+    if args.stress:
+        result = stress(seed=args.seed)
+        sys.stdout.write(
+            f"{result['operations']} changes and {result['snapshots']} "
+            f"snapshots in {result['seconds']:.2f}s, "
+            f"{len(result['failures'])} inconsistent\n"
+        )
+        for problem in sorted(set(result["failures"])):
+            sys.stdout.write(f"INCONSISTENT {problem}\n")
+        return 1 if result["failures"] else 0
+
+    results = run(args.sizes, args.seed)
+    report(results)
+
+    if args.save:
+        with open(args.save, "w") as baseline:
+            json.dump(results, baseline, indent=2)
+
+    if args.compare:
+        with open(args.compare) as baseline:
+            regressions = compare(results, json.load(baseline), args.threshold)
+        for name, before, after, slowdown in regressions:
+            sys.stdout.write(
+                f"REGRESSION {name}: p50 {before:.1f}us -> {after:.1f}us "
+                f"(+{slowdown:.0f}%)\n"
+            )
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
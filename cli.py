@@ -0,0 +1,243 @@
+"""Command line batch quoting without a display
+
+Reads gift specifications as CSV or JSON Lines and writes one priced quote
+per row as it goes, using the same rules as the Tk application. This module
+must never import tkinter.
+
+Each row may contain shape, width, height, depth, quality, colour, bow and
+label. A label is only included when the label field is present and not
+empty. Dimensions follow the same rules as the Configurator.
+
+    python cli.py gifts.csv
+    python cli.py --output jsonl < gifts.jsonl
+    python cli.py gifts.csv --tariffs tariffs.json --store Winchester
+"""
+
+import argparse
+import csv
+import json
+import sys
+
+import dimensions
+import export
+import pricing
+import tariffs
+
+SHAPE_CODES = {name.lower(): code for code, name in pricing.SHAPES.items()} | {
+    str(code): code for code in pricing.SHAPES
+}
+QUALITY_CODES = {
+    "0": 0,
+    "1": 1,
+    "cheap": 0,
+    "chp": 0,
+    "expensive": 1,
+    "exp": 1,
+}
+FLAG_VALUES = {
+    "": 0,
+    "0": 0,
+    "false": 0,
+    "no": 0,
+    "1": 1,
+    "true": 1,
+    "yes": 1,
+}
+COLOUR_NAMES = {colour.lower(): colour for colour in pricing.COLOURS}
+
+
+class SpecError(ValueError):
+    """Raised when a gift specification row cannot be quoted"""
+
+
+def _lookup(table: dict, field: str, value, default=None):
+    if value is None or value == "":
+        if default is None:
+            raise SpecError(f"missing {field}")
+        return default
+
+    try:
+        return table[str(value).strip().lower()]
+    except KeyError:
+        raise SpecError(f"invalid {field}: {value!r}") from None
+
+
+def parse_spec(
+    row: dict, max_size: float = pricing.MAX_SIZE
+) -> pricing.QuoteRecord:
+    """Returns a quote record for a gift specification row, raising
+    SpecError for any row that cannot be quoted"""
+    try:
+        return _parse_spec(row, max_size)
+    except SpecError:
+        raise
+    except (TypeError, ValueError, OverflowError) as error:
+        raise SpecError(f"invalid specification: {error}") from None
+
+
+def _parse_spec(row: dict, max_size: float) -> pricing.QuoteRecord:
+    shape = _lookup(SHAPE_CODES, "shape", row.get("shape"))
+    gift = pricing.GiftRecord(
+        shape,
+        row.get("width", ""),
+        row.get("height", ""),
+        row.get("depth", ""),
+    )
+    _, errors = dimensions.validate(shape, gift.x, gift.y, gift.z, max_size)
+    if errors:
+        raise SpecError(
+            f"invalid dimensions for {pricing.SHAPES[shape]}: "
+            + ", ".join(str(error) for error in errors)
+        )
+
+    wrap = pricing.WrapRecord(
+        _lookup(COLOUR_NAMES, "colour", row.get("colour"), pricing.COLOURS[0]),
+        _lookup(QUALITY_CODES, "quality", row.get("quality"), 0),
+    )
+
+    label = row.get("label")
+    return pricing.QuoteRecord(
+        gift,
+        wrap,
+        includes_label=int(label not in (None, "")),
+        label_text="" if label is None else str(label),
+        includes_bow=_lookup(FLAG_VALUES, "bow", row.get("bow"), 0),
+    )
+
+
+def read_rows(stream, format: str):
+    """Yields (line number, row) pairs from a CSV or JSON Lines stream"""
+    if format == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as error:
+            yield line_number, error
+            continue
+        yield line_number, row
+
+
+def quote_rows(rows, on_error, tariff: pricing.Tariff = None):
+    """Yields (quote, total, summary) for each valid row, calling
+    on_error(line number, error) for each invalid one"""
+    tariff = pricing.DEFAULT_TARIFF if tariff is None else tariff
+    for line_number, row in rows:
+        try:
+            if isinstance(row, Exception):
+                raise SpecError(str(row))
+            if not isinstance(row, dict):
+                raise SpecError("row is not an object")
+            quote = parse_spec(row, tariff.max_size)
+        except SpecError as error:
+            on_error(line_number, error)
+            continue
+
+        total = pricing.quote_total(quote, tariff=tariff)
+        yield quote, total, pricing.summarise(quote, total)
+
+
+def write_quotes(quotes, stream, format: str) -> int:
+    """Writes priced quotes to a stream and returns the number written"""
+    count = 0
+
+    if format == "csv":
+        writer = csv.DictWriter(stream, export.QUOTE_FIELDS)
+        writer.writeheader()
+        for quote in quotes:
+            writer.writerow(export.quote_row(*quote))
+            count += 1
+
+    elif format == "jsonl":
+        for quote in quotes:
+            stream.write(json.dumps(export.quote_row(*quote)) + "\n")
+            count += 1
+
+    else:
+        for _, _, summary in quotes:
+            stream.write(summary + "\n")
+            count += 1
+
+    return count
+
+
+def infer_format(path: str) -> str:
+    """Returns the input format of a specification file from its name"""
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def add_tariff_arguments(parser: argparse.ArgumentParser) -> None:
+    """Adds the --tariffs and --store options read by load_tariff"""
+    parser.add_argument("--tariffs", help="tariff file to take prices from")
+    parser.add_argument(
+        "--store",
+        default=pricing.STORE,
+        help=f"store whose tariff to use (default: {pricing.STORE})",
+    )
+
+
+def load_tariff(parser: argparse.ArgumentParser, args) -> pricing.Tariff:
+    """Returns the tariff chosen by --tariffs and --store, or None for the
+    built-in prices, exiting with a usage error if it cannot be loaded"""
+    if args.tariffs is None:
+        return None
+    try:
+        return tariffs.load(args.tariffs, args.store)[args.store]
+    except (OSError, tariffs.TariffError) as error:
+        parser.error(str(error))
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Price gift wrapping quotes from CSV or JSON Lines."
+    )
+    parser.add_argument(
+        "input",
+        nargs="?",
+        default="-",
+        help="gift specification file, or - for stdin (default)",
+    )
+    parser.add_argument(
+        "--input-format",
+        choices=["csv", "jsonl"],
+        help="input format, inferred from the file extension by default",
+    )
+    parser.add_argument(
+        "--output",
+        choices=["text", "csv", "jsonl"],
+        default="text",
+        help="output format (default: text summaries)",
+    )
+    add_tariff_arguments(parser)
+    args = parser.parse_args(argv)
+    tariff = load_tariff(parser, args)
+
+    failures = 0
+
+    def report(line_number: int, error: SpecError) -> None:
+        nonlocal failures
+        failures += 1
+        sys.stderr.write(f"line {line_number}: {error}\n")
+
+    if args.input == "-":
+        rows = read_rows(sys.stdin, args.input_format or "jsonl")
+        quotes = quote_rows(rows, report, tariff)
+        write_quotes(quotes, sys.stdout, args.output)
+    else:
+        input_format = args.input_format or infer_format(args.input)
+        with open(args.input, newline="", encoding="utf-8") as stream:
+            rows = read_rows(stream, input_format)
+            quotes = quote_rows(rows, report, tariff)
+            write_quotes(quotes, sys.stdout, args.output)
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,239 @@
+"""Compact column storage for very large orders
+
+A ColumnarOrder keeps each quote field in its own NumPy array and every
+label in one shared UTF-8 buffer, so a line costs under fifty bytes
+instead of a Quote's Python objects and Tk variables. The columns are
+handed to batch.quote_totals as they are, so pricing copies nothing.
+
+Lines go in and come out as pricing.QuoteRecords. Dimensions are stored
+as parsed numbers, with NaN for any that are not numeric, which come back
+as empty text so they are still priced at nothing.
+"""
+import math
+
+import numpy as np
+
+import batch
+import pricing
+
+CAPACITY = 64  # Lines allocated for an empty order
+COLUMNS = {
+    "shapes": np.int8,
+    "x": np.float64,
+    "y": np.float64,
+    "z": np.float64,
+    "qualities": np.int8,
+    "colours": np.uint16,
+    "bows": np.bool_,
+    "labels": np.bool_,
+    "label_lengths": np.int32,  # Characters, as priced
+    "label_starts": np.int64,  # Offsets into the label buffer
+    "label_sizes": np.int32,  # Bytes in the label buffer
+}
+PRICED_COLUMNS = (
+    "shapes",
+    "x",
+    "y",
+    "z",
+    "qualities",
+    "bows",
+    "labels",
+    "label_lengths",
+)
+
+
+def _number(value) -> float:
+    number = pricing.parse_number(value)
+    return math.nan if number is None else number
+
+
+def _dimension(value: float):
+    return "" if math.isnan(value) else value
+
+
+class ColumnarOrder:
+    """List-like order of quote records stored as columns"""
+
+    def __init__(self, records=()) -> None:
+        self._length = 0
+        self._arrays = {
+            name: np.zeros(CAPACITY, dtype=dtype)
+            for name, dtype in COLUMNS.items()
+        }
+        self._labels = bytearray()
+        self._garbage = 0  # Buffer bytes no longer used by any line
+
+        self.colour_names = list(pricing.COLOURS)
+        self._colour_codes = {
+            colour: code for code, colour in enumerate(self.colour_names)
+        }
+        self.extend(records)
+
+    @property
+    def nbytes(self) -> int:
+        """Returns the memory held by the columns and label buffer"""
+        return sum(array.nbytes for array in self._arrays.values()) + len(
+            self._labels
+        )
+
+    def column(self, name: str) -> np.ndarray:
+        """Returns a read-only view of one column"""
+        view = self._arrays[name][: self._length]
+        view.flags.writeable = False
+        return view
+
+    def columns(self) -> dict:
+        """Returns views of the columns as keyword arguments for
+        batch.quote_totals"""
+        return {name: self.column(name) for name in PRICED_COLUMNS}
+
+    def totals(self, tariff: pricing.Tariff = None) -> np.ndarray:
+        """Returns the cost of each line in pence"""
+        return batch.quote_totals(**self.columns(), tariff=tariff)
+
+    def get_total(self, tariff: pricing.Tariff = None) -> int:
+        """Returns the order total in pence"""
+        return int(self.totals(tariff).sum())
+
+    # Sequence
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self):
+        for index in range(self._length):
+            yield self._record(index)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [
+                self._record(position)
+                for position in range(*index.indices(self._length))
+            ]
+        return self._record(self._position(index))
+
+    def __setitem__(self, index: int, record: pricing.QuoteRecord) -> None:
+        index = self._position(index)
+        self._garbage += int(self._arrays["label_sizes"][index])
+        self._store(index, record)
+
+    def __delitem__(self, index: int) -> None:
+        self.pop(index)
+
+    def append(self, record: pricing.QuoteRecord) -> None:
+        self._reserve(self._length + 1)
+        self._length += 1
+        self._store(self._length - 1, record)
+
+    def extend(self, records) -> None:
+        for record in records:
+            self.append(record)
+
+    def insert(self, index: int, record: pricing.QuoteRecord) -> None:
+        # Resolve the position list.insert would use
+        if index < 0:
+            index += self._length
+        index = min(max(index, 0), self._length)
+
+        self._reserve(self._length + 1)
+        for array in self._arrays.values():
+            array[index + 1 : self._length + 1] = array[index : self._length]
+        self._length += 1
+        self._store(index, record)
+
+    def pop(self, index: int = -1) -> pricing.QuoteRecord:
+        index = self._position(index)
+        record = self._record(index)
+        self._garbage += int(self._arrays["label_sizes"][index])
+        for array in self._arrays.values():
+            array[index : self._length - 1] = array[index + 1 : self._length]
+        self._length -= 1
+        return record
+
+    def clear(self) -> None:
+        self._length = 0
+        self._labels.clear()
+        self._garbage = 0
+
+    # Storage
+    def _position(self, index: int) -> int:
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("order index out of range")
+        return index
+
+    def _reserve(self, length: int) -> None:
+        """Grows the arrays, doubling their capacity, to hold a length"""
+        capacity = len(self._arrays["shapes"])
+        if length <= capacity:
+            return
+        while capacity < length:
+            capacity *= 2
+        for name, array in self._arrays.items():
+            grown = np.zeros(capacity, dtype=array.dtype)
+            grown[: self._length] = array[: self._length]
+            self._arrays[name] = grown
+
+    def _colour_code(self, colour: str) -> int:
+        code = self._colour_codes.get(colour)
+        if code is None:
+            code = self._colour_codes[colour] = len(self.colour_names)
+            self.colour_names.append(colour)
+        return code
+
+    def _store(self, index: int, record: pricing.QuoteRecord) -> None:
+        """Writes a record into the columns at a line already allocated"""
+        gift, wrap = record.gift, record.wrap
+        label = record.label_text.encode("utf-8")
+
+        arrays = self._arrays
+        arrays["shapes"][index] = gift.shape
+        arrays["x"][index] = _number(gift.x)
+        arrays["y"][index] = _number(gift.y)
+        arrays["z"][index] = _number(gift.z)
+        arrays["qualities"][index] = wrap.quality
+        arrays["colours"][index] = self._colour_code(wrap.colour)
+        arrays["bows"][index] = record.includes_bow
+        arrays["labels"][index] = record.includes_label
+        arrays["label_lengths"][index] = len(record.label_text)
+        arrays["label_starts"][index] = len(self._labels)
+        arrays["label_sizes"][index] = len(label)
+        self._labels += label
+
+        if self._garbage > len(self._labels) // 2:
+            self._compact()
+
+    def _compact(self) -> None:
+        """Rewrites the label buffer without the labels of removed lines"""
+        starts = self._arrays["label_starts"]
+        sizes = self._arrays["label_sizes"]
+        labels = bytearray()
+        for index in range(self._length):
+            start = int(starts[index])
+            starts[index] = len(labels)
+            labels += self._labels[start : start + int(sizes[index])]
+        self._labels = labels
+        self._garbage = 0
+
+    def _label(self, index: int) -> str:
+        start = int(self._arrays["label_starts"][index])
+        size = int(self._arrays["label_sizes"][index])
+        return self._labels[start : start + size].decode("utf-8")
+
+    def _record(self, index: int) -> pricing.QuoteRecord:
+        arrays = self._arrays
+        return pricing.QuoteRecord(
+            pricing.GiftRecord(
+                int(arrays["shapes"][index]),
+                _dimension(float(arrays["x"][index])),
+                _dimension(float(arrays["y"][index])),
+                _dimension(float(arrays["z"][index])),
+            ),
+            pricing.WrapRecord(
+                self.colour_names[arrays["colours"][index]],
+                int(arrays["qualities"][index]),
+            ),
+            int(arrays["labels"][index]),
+            self._label(index),
+            int(arrays["bows"][index]),
+        )
@@ -0,0 +1,274 @@
+"""Cutting plans for the wrapping paper of a whole order
+
+Each gift is wrapped in one rectangular sheet cut from a roll of fixed
+width. Sheets of the same colour and quality share a roll and are packed
+onto it in shelves, tallest first, with each sheet going on the fullest
+shelf it still fits on (best fit decreasing height). A sheet is turned
+whenever that lets its longer side run across the roll.
+
+    python cutting.py gifts.csv --roll-width 75
+    python cutting.py gifts.csv --tariffs tariffs.json --store Winchester
+"""
+
+import argparse
+import bisect
+import sys
+
+import cli
+import pricing
+
+ROLL_WIDTH = 100  # CM
+
+
+class Cut:
+    """One sheet placed on a roll, with its offset along the roll as y"""
+
+    __slots__ = ("index", "x", "y", "width", "height", "rotated")
+
+    def __init__(
+        self,
+        index: int,
+        x: float,
+        y: float,
+        width: float,
+        height: float,
+        rotated: bool,
+    ) -> None:
+        self.index = index
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.rotated = rotated
+
+
+class RollPlan:
+    """Sheets cut from one roll of a single colour and quality"""
+
+    def __init__(self, colour: str, quality: int, roll_width: float) -> None:
+        self.colour = colour
+        self.quality = quality
+        self.roll_width = roll_width
+        self.length = 0  # CM of roll used
+        self.sheet_area = 0  # CM2 of paper used by the sheets
+        self.cuts = []
+
+    @property
+    def used_area(self) -> float:
+        return self.roll_width * self.length
+
+    @property
+    def waste(self) -> float:
+        """Returns the offcut area in CM2"""
+        return self.used_area - self.sheet_area
+
+    @property
+    def waste_fraction(self) -> float:
+        return self.waste / self.used_area if self.used_area else 0
+
+
+class CuttingPlan:
+    """Rolls keyed by (colour, quality), plus the order indices of sheets
+    too large for the roll and of gifts with nothing to wrap"""
+
+    def __init__(self, roll_width: float) -> None:
+        self.roll_width = roll_width
+        self.rolls = {}
+        self.oversize = []
+        self.skipped = []
+
+    @property
+    def length(self) -> float:
+        return sum(roll.length for roll in self.rolls.values())
+
+    @property
+    def waste(self) -> float:
+        return sum(roll.waste for roll in self.rolls.values())
+
+
+def _pack(roll: RollPlan, sheets: list) -> None:
+    """Packs (index, width, height, rotated) sheets onto a roll in shelves"""
+    sheets.sort(key=lambda sheet: sheet[2], reverse=True)
+
+    # Shelves as (remaining width, shelf number), kept sorted so the
+    # fullest shelf a sheet fits on is found by bisection
+    shelves = []
+    offsets = []  # Offset of each shelf along the roll
+    for index, width, height, rotated in sheets:
+        position = bisect.bisect_left(shelves, (width, -1))
+        if position < len(shelves):
+            remaining, shelf = shelves.pop(position)
+        else:
+            remaining, shelf = roll.roll_width, len(offsets)
+            offsets.append(roll.length)
+            roll.length += height
+
+        roll.cuts.append(
+            Cut(
+                index,
+                roll.roll_width - remaining,
+                offsets[shelf],
+                width,
+                height,
+                rotated,
+            )
+        )
+        roll.sheet_area += width * height
+        bisect.insort(shelves, (remaining - width, shelf))
+
+
+def plan_order(
+    records, roll_width: float = ROLL_WIDTH, overlap: float = None
+) -> CuttingPlan:
+    """Returns a cutting plan for a sequence of quote records"""
+    plan = CuttingPlan(roll_width)
+    groups = {}
+
+    for index, record in enumerate(records):
+        gift = record.gift
+        size = pricing.sheet_size(
+            gift.shape,
+            pricing.parse_dimensions(gift.shape, gift.x, gift.y, gift.z),
+            overlap,
+        )
+        if size is None or min(size) <= 0:
+            plan.skipped.append(index)
+            continue
+
+        # Run the longer side across the roll when it fits
+        width, height = size
+        rotated = height > width
+        if rotated:
+            width, height = height, width
+        if width > roll_width:
+            width, height, rotated = height, width, not rotated
+            if width > roll_width:
+                plan.oversize.append(index)
+                continue
+
+        key = (record.wrap.colour, record.wrap.quality)
+        groups.setdefault(key, []).append((index, width, height, rotated))
+
+    for (colour, quality), sheets in groups.items():
+        roll = plan.rolls[colour, quality] = RollPlan(
+            colour, quality, roll_width
+        )
+        _pack(roll, sheets)
+
+    return plan
+
+
+def waste_aware_totals(
+    records, plan: CuttingPlan, tariff: pricing.Tariff = None
+) -> list:
+    """Returns the price of each quote in pence, charging each sheet its
+    share of the offcuts on its roll"""
+    tariff = pricing.DEFAULT_TARIFF if tariff is None else tariff
+
+    # Paper prices scaled by the roll area used per CM2 of sheet
+    scaled = {}
+    for key, roll in plan.rolls.items():
+        factor = roll.used_area / roll.sheet_area
+        scaled[key] = {
+            quality: price * factor
+            for quality, price in enumerate(tariff.prices)
+        }
+
+    return [
+        pricing.quote_total(
+            record,
+            scaled.get((record.wrap.colour, record.wrap.quality)),
+            tariff=tariff,
+        )
+        for record in records
+    ]
+
+
+def report(plan: CuttingPlan) -> str:
+    """Returns a table of roll length and waste for each roll"""
+    lines = [
+        f"{'Colour':<20}{'Quality':<9}{'Sheets':>7}"
+        f"{'Length cm':>12}{'Waste cm2':>13}{'Waste':>8}"
+    ]
+    for (colour, quality), roll in sorted(plan.rolls.items()):
+        lines.append(
+            f"{colour:<20}{'EXP' if quality else 'CHP':<9}"
+            f"{len(roll.cuts):>7}{roll.length:>12.1f}"
+            f"{roll.waste:>13.0f}{roll.waste_fraction:>8.1%}"
+        )
+    sheets = sum(len(roll.cuts) for roll in plan.rolls.values())
+    lines.append(
+        f"{'Total':<29}{sheets:>7}{plan.length:>12.1f}{plan.waste:>13.0f}"
+    )
+    if plan.oversize:
+        lines.append(
+            f"{len(plan.oversize)} sheets are wider than the "
+            f"{plan.roll_width:g} cm roll"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Plan the paper cuts for an order of gifts."
+    )
+    parser.add_argument(
+        "input",
+        nargs="?",
+        default="-",
+        help="gift specification file, or - for stdin (default)",
+    )
+    parser.add_argument(
+        "--input-format",
+        choices=["csv", "jsonl"],
+        help="input format, inferred from the file extension by default",
+    )
+    parser.add_argument(
+        "--roll-width",
+        type=float,
+        default=ROLL_WIDTH,
+        help=f"paper roll width in cm (default: {ROLL_WIDTH})",
+    )
+    parser.add_argument(
+        "--waste-aware",
+        action="store_true",
+        help="also compare the subtotal with offcuts charged to each quote",
+    )
+    cli.add_tariff_arguments(parser)
+    args = parser.parse_args(argv)
+    tariff = cli.load_tariff(parser, args)
+
+    failures = 0
+
+    def skip(line_number: int, error: cli.SpecError) -> None:
+        nonlocal failures
+        failures += 1
+        sys.stderr.write(f"line {line_number}: {error}\n")
+
+    if args.input == "-":
+        rows = cli.read_rows(sys.stdin, args.input_format or "jsonl")
+        quotes = list(cli.quote_rows(rows, skip, tariff))
+    else:
+        input_format = args.input_format or cli.infer_format(args.input)
+        with open(args.input, newline="", encoding="utf-8") as stream:
+            rows = cli.read_rows(stream, input_format)
+            quotes = list(cli.quote_rows(rows, skip, tariff))
+
+    records = [quote for quote, _, _ in quotes]
+    overlap = None if tariff is None else tariff.overlap
+    plan = plan_order(records, args.roll_width, overlap)
+    sys.stdout.write(report(plan) + "\n")
+
+    if args.waste_aware:
+        subtotal = sum(total for _, total, _ in quotes)
+        waste_aware = sum(waste_aware_totals(records, plan, tariff))
+        sys.stdout.write(
+            f"Subtotal: {pricing.display_pounds(subtotal)}\n"
+            f"Waste aware subtotal: {pricing.display_pounds(waste_aware)}\n"
+        )
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""Shared parsing and validation of gift dimensions
+
+The Configurator, the command line tools and the pricing core all read
+dimensions through this module, so they agree on what is valid. Parsed
+fields are memoised by their text, so a field is only parsed again once
+its text changes. This module must never import tkinter.
+"""
+import functools
+import math
+
+FIELDS = ("width", "height", "depth")
+SHAPE_FIELDS = {0: 1, 1: 3, 2: 2}  # Dimensions used by each gift shape
+CACHE_SIZE = 4096  # Distinct field values memoised
+
+# Error codes, in the order fields are checked
+LETTERS = "letters"
+INVALID = "invalid"
+EMPTY = "empty"
+NEGATIVE = "negative"
+TOO_LARGE = "too large"
+
+DESCRIPTIONS = {
+    LETTERS: "contains letters",
+    INVALID: "is not a number",
+    EMPTY: "is empty or zero",
+    NEGATIVE: "is negative",
+    TOO_LARGE: "exceeds {max_size} cm",
+}
+MESSAGES = {
+    LETTERS: "Gift Dimensions Can't Contain Letters.",
+    INVALID: "Gift Dimensions Must be Numbers.",
+    EMPTY: "Gift Dimensions Can't be Empty, Zero or Negative.",
+    NEGATIVE: "Gift Dimensions Can't be Negative.",
+    TOO_LARGE: "Gift Dimensions Exceed {max_size} cm.",
+}
+
+
+class DimensionError:
+    """Why a single dimension field was rejected"""
+
+    __slots__ = ("field", "code", "value", "max_size")
+
+    def __init__(self, field: str, code: str, value, max_size=None) -> None:
+        self.field = field
+        self.code = code
+        self.value = value
+        self.max_size = max_size
+
+    @property
+    def message(self) -> str:
+        """Returns the explanation shown to staff in the Configurator"""
+        limit = self._limit()
+        if self.code in (LETTERS, INVALID) or not limit:
+            advice = "Please Only Enter Numerical Values."
+        else:
+            advice = f"Please Enter a Value Between 1 and {limit}."
+        return f"{MESSAGES[self.code].format(max_size=limit)}\n{advice}"
+
+    def _limit(self) -> str:
+        return "" if self.max_size is None else f"{self.max_size:g}"
+
+    def __eq__(self, other) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return (self.field, self.code, self.value, self.max_size) == (
+            other.field,
+            other.code,
+            other.value,
+            other.max_size,
+        )
+
+    def __repr__(self) -> str:
+        return f"DimensionError({self.field!r}, {self.code!r}, {self.value!r})"
+
+    def __str__(self) -> str:
+        description = DESCRIPTIONS[self.code].format(max_size=self._limit())
+        return f"{self.field} {description}"
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE, typed=True)
+def parse_number(value) -> float:
+    """Returns a value as a float, or None if it is not numeric"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE, typed=True)
+def parse_field(value, max_size: float = None) -> tuple:
+    """Returns (size, error code) for one dimension field, where the size
+    is None unless the error code is"""
+    if isinstance(value, bool):
+        return None, INVALID
+
+    if isinstance(value, str):
+        if any(character.isalpha() for character in value):
+            return None, LETTERS
+        if not value.strip():
+            return None, EMPTY
+
+    size = parse_number(value)
+    if size is None or not math.isfinite(size):
+        return None, INVALID
+    if size == 0:
+        return None, EMPTY
+    if size < 0:
+        return None, NEGATIVE
+    if max_size is not None and size > max_size:
+        return None, TOO_LARGE
+    return size, None
+
+
+def validate(shape: int, x, y, z, max_size: float = None) -> tuple:
+    """Returns (dimensions, errors) for the fields used by a gift shape
+
+    Dimensions are floats in width, height, depth order, or None when any
+    field has an error. Errors is a list of DimensionErrors.
+    """
+    values = (x, y, z)[: SHAPE_FIELDS.get(shape, 3)]
+    sizes = []
+    errors = []
+    for field, value in zip(FIELDS, values):
+        try:
+            size, code = parse_field(value, max_size)
+        except TypeError:  # Unhashable values cannot be numbers either
+            size, code = None, INVALID
+        if code is None:
+            sizes.append(size)
+        else:
+            errors.append(DimensionError(field, code, value, max_size))
+
+    return (None if errors else tuple(sizes)), errors
@@ -0,0 +1,240 @@
+"""Streaming order exports in text, CSV and JSON Lines formats
+
+Lines are written one at a time through a single buffered writer, so memory
+use does not grow with the size of the order. Exports to a path are written
+to a temporary file beside it and renamed into place once complete, so a
+reader never sees half an export. ExportWriter runs exports on a background
+thread.
+"""
+
+import concurrent.futures
+import csv
+import json
+import os
+import stat
+import tempfile
+
+import instrument
+import pricing
+
+FORMATS = {"text": "txt", "csv": "csv", "jsonl": "jsonl"}
+BUFFER_SIZE = 1 << 16  # Bytes buffered between writes to disk
+PROGRESS_INTERVAL = 256  # Lines written between progress reports
+
+QUOTE_FIELDS = [
+    "shape",
+    "width",
+    "height",
+    "depth",
+    "quality",
+    "colour",
+    "bow",
+    "label",
+    "total",
+    "summary",
+]
+ORDER_FIELDS = ["order", "store", "date"]
+
+
+def quote_row(quote: pricing.QuoteRecord, total: int, summary: str) -> dict:
+    """Returns the structured export fields of a priced quote"""
+    gift = quote.gift
+    return {
+        "shape": pricing.SHAPES[gift.shape],
+        "width": gift.x,
+        "height": gift.y,
+        "depth": gift.z,
+        "quality": quote.wrap.quality,
+        "colour": quote.wrap.colour,
+        "bow": quote.includes_bow,
+        "label": quote.label_text if quote.includes_label else None,
+        "total": total,
+        "summary": summary,
+    }
+
+
+def default_filename(order_id: int, datestamp: str, format: str) -> str:
+    return f"Export - {datestamp} - Order #{order_id}.{FORMATS[format]}"
+
+
+def write_order(
+    stream,
+    lines,
+    order_id: int,
+    items: int,
+    subtotal: int,
+    store: str,
+    datestamp: str,
+    format: str = "text",
+) -> None:
+    """Writes an order to an open text stream
+
+    Lines are (quote record, total, summary) tuples. The quote record is
+    not read by the text format, so it may be None there.
+    """
+    if format == "text":
+        header = [
+            f"{'=' * 20} Spence's International - {store} {'=' * 20}",
+            "Thank you for your purchase!",
+            f"Order Number: {order_id}",
+            f"Date: {datestamp}",
+            f"Items: {items}",
+            f"Subtotal: {pricing.display_pounds(subtotal)}",
+            f"{'-' * 31} Order Contents {'-' * 31}",
+        ]
+        stream.writelines(line + "\n" for line in header)
+        stream.writelines(summary + "\n" for _, _, summary in lines)
+
+    elif format == "csv":
+        order = {"order": order_id, "store": store, "date": datestamp}
+        writer = csv.DictWriter(stream, ORDER_FIELDS + QUOTE_FIELDS)
+        writer.writeheader()
+        for line in lines:
+            row = quote_row(*line)
+            row.update(order)
+            writer.writerow(row)
+
+    elif format == "jsonl":
+        order = {
+            "order": order_id,
+            "store": store,
+            "date": datestamp,
+            "items": items,
+            "subtotal": subtotal,
+        }
+        stream.write(json.dumps(order) + "\n")
+        stream.writelines(
+            json.dumps(quote_row(*line)) + "\n" for line in lines
+        )
+
+    else:
+        raise ValueError(f"unknown export format: {format!r}")
+
+
+def _reporting(lines, progress):
+    """Yields lines, calling progress(lines written) every
+    PROGRESS_INTERVAL lines and once at the end"""
+    written = 0
+    for written, line in enumerate(lines, 1):
+        yield line
+        if not written % PROGRESS_INTERVAL:
+            progress(written)
+    progress(written)
+
+
+def _new_file_mode(temporary: str) -> int:
+    """Returns the permissions open() would give a new file, as temporary
+    files get 0600, by creating one beside the temporary file"""
+    probe = temporary + ".mode"
+    os.close(os.open(probe, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666))
+    try:
+        return stat.S_IMODE(os.stat(probe).st_mode)
+    finally:
+        os.unlink(probe)
+
+
+def export_order(
+    target, lines, format: str = "text", progress=None, **order
+) -> str:
+    """Writes an order to a path or an open file object and returns its name
+
+    A path is only replaced once the whole export has been written. When
+    progress is given it is called with the number of lines written so far.
+    Remaining keyword arguments are passed through to write_order.
+    """
+    if format not in FORMATS:
+        raise ValueError(f"unknown export format: {format!r}")
+    if progress is not None:
+        lines = _reporting(lines, progress)
+
+    if hasattr(target, "write"):
+        write_order(target, lines, format=format, **order)
+        return getattr(target, "name", None)
+
+    directory = os.path.dirname(os.path.abspath(target))
+    descriptor, temporary = tempfile.mkstemp(
+        prefix=".export-", suffix=".tmp", dir=directory
+    )
+    try:
+        with open(
+            descriptor,
+            "w",
+            buffering=BUFFER_SIZE,
+            encoding="utf-8",
+            newline="" if format == "csv" else None,
+        ) as stream:
+            write_order(stream, lines, format=format, **order)
+            stream.flush()
+            os.fsync(stream.fileno())
+        os.chmod(temporary, _new_file_mode(temporary))
+        os.replace(temporary, target)
+    except BaseException:
+        try:
+            os.unlink(temporary)
+        except OSError:
+            pass
+        raise
+    return str(target)
+
+
+class ExportWriter:
+    """Runs exports one after another on a background thread
+
+    Progress and completion callbacks are handed to post, which runs them
+    on the writer's thread by default. The Tk application passes
+    UpdateQueue.post so they run on its main loop instead.
+    """
+
+    def __init__(self, post=None) -> None:
+        self._post = post
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="export"
+        )
+
+    def submit(
+        self,
+        target,
+        lines,
+        format: str = "text",
+        on_progress=None,
+        on_done=None,
+        **order,
+    ) -> concurrent.futures.Future:
+        """Queues an export, returning a future of its name
+
+        on_progress is called as on_progress(lines written, items) and
+        on_done as on_done(name, error), with one of the two None.
+        """
+        return self._executor.submit(
+            self._export, target, lines, format, on_progress, on_done, order
+        )
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stops accepting exports, by default finishing those queued"""
+        self._executor.shutdown(wait=wait)
+
+    @instrument.timed("Order.export")
+    def _export(
+        self, target, lines, format, on_progress, on_done, order
+    ) -> str:
+        progress = None
+        if on_progress is not None:
+
+            def progress(written: int) -> None:
+                self._notify(on_progress, written, order.get("items"))
+
+        try:
+            name = export_order(target, lines, format, progress, **order)
+        except Exception as error:
+            self._notify(on_done, None, error)
+            raise
+        self._notify(on_done, name, None)
+        return name
+
+    def _notify(self, callback, *args) -> None:
+        if callback is None:
+            return
+        if self._post is None:
+            callback(*args)
+        else:
+            self._post(callback, *args)
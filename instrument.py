@@ -0,0 +1,156 @@
+"""Opt-in timing instrumentation for the hot paths
+
+Set QUOTEGEN_PROFILE=1 before starting the application to record call
+counts and timings. When it is unset, timed() returns functions unchanged,
+so instrumented code runs at full speed.
+"""
+import functools
+import os
+import signal
+import sys
+import threading
+import time
+from collections import deque
+
+ENABLED = os.environ.get("QUOTEGEN_PROFILE", "") not in ("", "0")
+WINDOW = 1024  # Recent samples kept per name for percentiles
+PROBE_INTERVAL = 100  # Milliseconds between Tk event loop latency probes
+
+
+class Timing:
+    """Call count, cumulative time and recent samples for one name"""
+
+    __slots__ = ("count", "total", "maximum", "samples")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+        self.samples = deque(maxlen=WINDOW)
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.maximum = max(self.maximum, seconds)
+        self.samples.append(seconds)
+
+    def percentile(self, fraction: float) -> float:
+        samples = sorted(self.samples)
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+
+_timings = {}
+_lock = threading.Lock()
+
+
+def record(name: str, seconds: float) -> None:
+    """Adds one timing sample under a name"""
+    with _lock:
+        try:
+            timing = _timings[name]
+        except KeyError:
+            timing = _timings[name] = Timing()
+        timing.add(seconds)
+
+
+def timed(name: str):
+    """Decorator recording the duration of every call when enabled"""
+
+    def decorator(function):
+        if not ENABLED:
+            return function
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def snapshot() -> dict:
+    """Returns a copy of the current timings keyed by name"""
+    with _lock:
+        return {
+            name: {
+                "calls": timing.count,
+                "total": timing.total,
+                "p50": timing.percentile(0.5),
+                "p90": timing.percentile(0.9),
+                "p99": timing.percentile(0.99),
+                "max": timing.maximum,
+            }
+            for name, timing in _timings.items()
+        }
+
+
+def dump(stream=None) -> None:
+    """Writes a timing report, in milliseconds, to a stream"""
+    stream = sys.stderr if stream is None else stream
+    stream.write(
+        f"{'Name':<32}{'calls':>9}{'total':>11}{'p50':>9}"
+        f"{'p90':>9}{'p99':>9}{'max':>9}\n"
+    )
+    for name, timing in sorted(snapshot().items()):
+        stream.write(
+            f"{name:<32}{timing['calls']:>9}"
+            f"{timing['total'] * 1000:>11.1f}"
+            f"{timing['p50'] * 1000:>9.2f}{timing['p90'] * 1000:>9.2f}"
+            f"{timing['p99'] * 1000:>9.2f}{timing['max'] * 1000:>9.2f}\n"
+        )
+    stream.flush()
+
+
+def watch_event_loop(widget) -> None:
+    """Records how late the Tk main loop runs a periodic timer, as a measure
+    of event handling latency"""
+    if not ENABLED:
+        return
+
+    def probe(scheduled: float) -> None:
+        now = time.perf_counter()
+        record("Tk event latency", max(0.0, now - scheduled))
+        widget.after(PROBE_INTERVAL, probe, now + PROBE_INTERVAL / 1000)
+
+    widget.after(
+        PROBE_INTERVAL, probe, time.perf_counter() + PROBE_INTERVAL / 1000
+    )
+
+
+def install_signal_handler(widget=None) -> None:
+    """Dumps timings to standard error on SIGUSR1, where supported
+
+    The signal may arrive while the main thread holds the timings lock, so
+    the handler never dumps itself. It schedules the dump on the widget's
+    Tk loop, or wakes a helper thread when there is no widget.
+    """
+    if not ENABLED or not hasattr(signal, "SIGUSR1"):
+        return
+
+    if widget is not None:
+
+        def handler(*args) -> None:
+            widget.after_idle(dump)
+
+    else:
+        requested = threading.Event()
+
+        def dump_when_requested() -> None:
+            while True:
+                requested.wait()
+                requested.clear()
+                dump()
+
+        threading.Thread(target=dump_when_requested, daemon=True).start()
+
+        def handler(*args) -> None:
+            requested.set()
+
+    signal.signal(signal.SIGUSR1, handler)
@@ -1,34 +1,40 @@
+import os
+import queue
+import sys
 import threading
-import math
 import time
 import tkinter as tk
+from collections import Counter, OrderedDict
 from tkinter import font, messagebox, ttk
 
-# Global
-STORE = "Winchester"
-
+import cutting
+import dimensions
+import export
+import instrument
+import pricing
+import tariffs
+from orderstore import OrderStore
+from pricing import display_pounds
 
-def display_pounds(pence: int) -> str:
-    return "£{0:0.2f}".format(pence / 100)
+# Global
+STORE = os.environ.get("QUOTEGEN_STORE", pricing.STORE)
+ORDER_STORE_PATH = "orders.db"
+TARIFF_PATH = "tariffs.json"
 
 
 # Data Classes
 class Wrap:
 
-    OVERLAP = 3  # Overlap left on each side
-    PRICES = {0: 0.4, 1: 0.75}  # Price Per Centimeter (In Pence) Low & High
-    COLOURS = [
-        "Purple",
-        "DarkSlateGray4",
-        "Deep Sky Blue",
-        "Light Sea Green",
-        "VioletRed2",
-        "Gold",
-    ]
+    COLOURS = pricing.COLOURS
     SHAPE_VECTORS = {
         "Trapezium": [(0, 15), (7.25, 0), (30, 0), (37.25, 15)],
         "Hexagon": [(0, 15), (15, 0), (30, 0), (45, 15), (30, 30), (15, 30)],
     }
+    TILE_CACHE_SIZE = 8  # Tessellations kept across all preview canvases
+
+    # Reusable tile sets keyed by canvas, quality and canvas size
+    _tile_cache = OrderedDict()
+    _tile_canvases = set()  # Canvases whose tile sets go when destroyed
 
     def __init__(self, colour: str = COLOURS[0], quality: int = 0) -> None:
         self.colour = tk.StringVar(value=colour)
@@ -38,24 +44,86 @@ class Wrap:
         """Returns a copy of itself"""
         return Wrap(colour=self.colour.get(), quality=self.quality.get())
 
+    def record(self) -> pricing.WrapRecord:
+        """Returns an immutable snapshot for the pricing core"""
+        return pricing.WrapRecord(self.colour.get(), self.quality.get())
+
+    @instrument.timed("Wrap.draw")
     def draw(self, canvas) -> None:
-        """Draws the selected paper on a canvas widget"""
-        canvas.delete("all")
+        """Draws the selected paper on a canvas widget
+
+        Each quality's tessellation is built once per canvas and then reused,
+        so changing colour only recolours the existing items.
+        """
+        quality = self.quality.get()
+        colour = self.colour.get()
+        width = int(canvas.cget("width"))
+        height = int(canvas.cget("height"))
+
+        name = str(canvas)
+        key = (name, quality, width, height)
+        tiles = Wrap._tile_cache.get(key)
+
+        if tiles is None:
+            if name not in Wrap._tile_canvases:
+                Wrap._tile_canvases.add(name)
+                canvas.bind(
+                    "<Destroy>",
+                    lambda event: Wrap._forget_canvas(str(event.widget)),
+                    add="+",
+                )
+
+            tag = f"wrap-{quality}-{width}x{height}"
+            Wrap._tessellate(canvas, tag, quality, width, height)
+            tiles = Wrap._tile_cache[key] = [canvas, tag, None]
+
+            # Delete the least recently used tile sets
+            while len(Wrap._tile_cache) > Wrap.TILE_CACHE_SIZE:
+                stale_canvas, stale_tag, _ = Wrap._tile_cache.popitem(False)[1]
+                try:
+                    stale_canvas.delete(stale_tag)
+                except tk.TclError:  # Canvas already destroyed
+                    pass
+        else:
+            Wrap._tile_cache.move_to_end(key)
 
-        if not self.quality.get():
+        canvas, tag, cached_colour = tiles
+
+        # Show only the selected quality's tiles
+        if canvas.itemcget(tag, "state") != "normal":
+            canvas.itemconfigure("wrap", state="hidden")
+            canvas.itemconfigure(tag, state="normal")
+
+        if cached_colour != colour:
+            canvas.itemconfigure(tag, fill=colour)
+            tiles[2] = colour
+
+    @staticmethod
+    def _forget_canvas(name: str) -> None:
+        """Drops the tile sets of a destroyed canvas"""
+        Wrap._tile_canvases.discard(name)
+        for key in [key for key in Wrap._tile_cache if key[0] == name]:
+            del Wrap._tile_cache[key]
+
+    @staticmethod
+    def _tessellate(
+        canvas, tag: str, quality: int, width: int, height: int
+    ) -> None:
+        """Creates a hidden set of tiles covering the canvas"""
+        if not quality:
             vectors = Wrap.SHAPE_VECTORS["Trapezium"]
-            height = 15
-            width = 38
+            tile_height = 15
+            tile_width = 38
             offset = 0
         else:
             vectors = Wrap.SHAPE_VECTORS["Hexagon"]
-            height = 30
-            width = 45
+            tile_height = 30
+            tile_width = 45
             offset = 30
 
         odd_line = False
-        for y in range(0, int(canvas.cget("height")), height):
-            for x in range(0, int(canvas.cget("width")), width):
+        for y in range(0, height, tile_height):
+            for x in range(0, width, tile_width):
 
                 if odd_line:
                     x -= offset
@@ -66,15 +134,18 @@ class Wrap:
                     vertices.append(vector[1] + y)
 
                 canvas.create_polygon(
-                    *vertices, fill=self.colour.get(), outline="#000000"
+                    *vertices,
+                    outline="#000000",
+                    state="hidden",
+                    tags=("wrap", tag),
                 )
             odd_line = not odd_line
 
 
 class Gift:
 
-    SHAPES = {0: "Cube", 1: "Cuboid", 2: "Cylinder"}
-    MAX_SIZE = 500
+    SHAPES = pricing.SHAPES
+    MAX_SIZE = pricing.MAX_SIZE
 
     def __init__(
         self, shape: int = 0, x: int = 1, y: int = 1, z: int = 1
@@ -93,64 +164,41 @@ class Gift:
             z=self.z.get(),
         )
 
-    def get_dimensions(self) -> list:
-        """Returns dimensions as integers, in width, height, depth order"""
-        if self.shape.get() == 0:
-            dimensions = [self.x]
-
-        elif self.shape.get() == 1:
-            dimensions = [self.x, self.y, self.z]
-
-        else:
-            dimensions = [self.x, self.y]
+    def record(self) -> pricing.GiftRecord:
+        """Returns an immutable snapshot for the pricing core"""
+        return pricing.GiftRecord(
+            self.shape.get(), self.x.get(), self.y.get(), self.z.get()
+        )
 
-        try:
-            return [float(value.get()) for value in dimensions]
-        except ValueError:
-            return ValueError
+    def get_dimensions(self) -> tuple:
+        """Returns dimensions as floats in width, height, depth order, or
+        None if any of them is not numeric"""
+        return pricing.parse_dimensions(
+            self.shape.get(), self.x.get(), self.y.get(), self.z.get()
+        )
 
+    def validate(self, max_size: float = None) -> list:
+        """Returns a DimensionError for each invalid dimension in use"""
+        return dimensions.validate(
+            self.shape.get(),
+            self.x.get(),
+            self.y.get(),
+            self.z.get(),
+            max_size,
+        )[1]
+
+    @instrument.timed("Gift.wrap")
     def wrap(self) -> float:
         """Returns amount of paper required to wrap the gift in CM2"""
-        dimensions = self.get_dimensions()
-
-        # Return 0 if dimensions are currently invalid
-        if dimensions is ValueError:
-            return 0
-
-        # If Cube
-        elif self.shape.get() == 0:
-            if 0 in dimensions:
-                return 0
-            else:
-                wrap_width = dimensions[0] * 4
-                wrap_height = dimensions[0] * 3
-
-        # If Cuboid
-        elif self.shape.get() == 1:
-            if dimensions.count(0) > 1:
-                return 0
-            else:
-                wrap_width = (dimensions[0] * 2) + (dimensions[1] * 2)
-                wrap_height = (dimensions[1] * 2) + dimensions[2]
-
-        # If Cylinder
-        else:
-            if 0 in dimensions:
-                return 0
-            else:
-                wrap_width = dimensions[0] * math.pi
-                wrap_height = (dimensions[0] * 2) + dimensions[1]
-
-        # Calculate and return sheet area
-        overlap = 2 * Wrap.OVERLAP
-        return (wrap_width + overlap) * (wrap_height + overlap)
+        return pricing.gift_area(self.record(), Quote.tariff.overlap)
 
 
 class Quote:
 
-    MAX_LABEL_SUMMARY_LENGTH = (
-        20  # Maximum number of label characters visible in quote summary
-    )
+    MAX_LABEL_SUMMARY_LENGTH = pricing.MAX_LABEL_SUMMARY_LENGTH
+
+    # Prices in force, replaced when the tariff file is reloaded
+    tariff = pricing.DEFAULT_TARIFF
 
     def __init__(
         self,
@@ -167,6 +215,9 @@ class Quote:
         self.label_text = tk.StringVar(value=label_text)
         self.includes_bow = tk.IntVar(value=includes_bow)
 
+        self._subscribers = []
+        self._traces = []
+
     def copy(self) -> object:
         """Returns a copy of itself"""
         return Quote(
@@ -177,77 +228,464 @@ class Quote:
             includes_bow=self.includes_bow.get(),
         )
 
-    def get_total(self) -> int:
-        """Retuns the quote cost in pence"""
-        # Calculate paper cost ensuring to always round half up
-        total = math.ceil(
-            self.gift.wrap() * Wrap.PRICES[self.wrapping_paper.quality.get()]
-        )
+    def variables(self) -> list:
+        """Returns every Tk variable the quote is priced from"""
+        return [
+            self.gift.shape,
+            self.gift.x,
+            self.gift.y,
+            self.gift.z,
+            self.wrapping_paper.colour,
+            self.wrapping_paper.quality,
+            self.includes_label,
+            self.label_text,
+            self.includes_bow,
+        ]
 
-        if self.includes_bow.get():
-            total += 150
+    def subscribe(self, callback) -> None:
+        """Registers a callback run as callback(quote) after any field changes
+
+        Variable traces are only installed while the quote has subscribers.
+        """
+        if not self._subscribers:
+            for variable in self.variables():
+                trace = variable.trace_add("write", self._changed)
+                self._traces.append((variable, trace))
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback) -> None:
+        self._subscribers.remove(callback)
+        if not self._subscribers:
+            for variable, trace in self._traces:
+                variable.trace_remove("write", trace)
+            self._traces.clear()
+
+    def _changed(self, *args) -> None:
+        for callback in self._subscribers:
+            callback(self)
+
+    @classmethod
+    def from_record(cls, record: pricing.QuoteRecord) -> object:
+        """Returns a new quote initialised from a pricing record"""
+        gift, wrap = record.gift, record.wrap
+        return cls(
+            gift=Gift(shape=gift.shape, x=gift.x, y=gift.y, z=gift.z),
+            wrap=Wrap(colour=wrap.colour, quality=wrap.quality),
+            includes_label=record.includes_label,
+            label_text=record.label_text,
+            includes_bow=record.includes_bow,
+        )
 
-        if self.includes_label.get():
-            total += 50 + (2 * len(self.label_text.get()))
+    def record(self) -> pricing.QuoteRecord:
+        """Returns an immutable snapshot for the pricing core"""
+        return pricing.QuoteRecord(
+            self.gift.record(),
+            self.wrapping_paper.record(),
+            self.includes_label.get(),
+            self.label_text.get(),
+            self.includes_bow.get(),
+        )
 
-        return total
+    @instrument.timed("Quote.get_total")
+    def get_total(self) -> int:
+        """Retuns the quote cost in pence"""
+        return pricing.quote_total(self.record(), tariff=Quote.tariff)
 
+    @instrument.timed("Quote.__str__")
     def __str__(self) -> str:
         """Returns a short string summarising the quote configuration"""
-        # Format dimensions as WxHxD string
-        dimensions_string = "x".join(
-            [str(round(value, 1)) for value in self.gift.get_dimensions()]
-        )
-
-        # Check if label is too long for full display
-        label_text = self.label_text.get()
-        if len(label_text) > Quote.MAX_LABEL_SUMMARY_LENGTH:
-            label_text = f"{label_text[:Quote.MAX_LABEL_SUMMARY_LENGTH - 4]}"
-            +"..."
-
-        # Price, Shape, Size, Quality, Colour, Bow, Label, Label Text
-        data = [
-            display_pounds(self.get_total()),
-            Gift.SHAPES[self.gift.shape.get()],
-            f" {dimensions_string} CM",
-            "EXP" if self.wrapping_paper.quality.get() else "CHP",
-            self.wrapping_paper.colour.get(),
-            "BOW" if self.includes_bow.get() else "NO BOW",
-            f"LBL: {label_text}" if self.includes_label.get() else "NO LABEL",
-        ]
+        return pricing.summarise(self.record(), self.get_total())
 
-        return "[Cost: {}] - [Gift: {},{}] - [Wrap: {}, {}] - [{}, {}]".format(
-            *data
-        )
+
+class OrderSnapshot:
+    """Immutable copy of an order's records and prices at one version"""
+
+    __slots__ = ("id", "version", "records", "prices", "subtotal")
+
+    def __init__(
+        self,
+        id: int,
+        version: int,
+        records: tuple,
+        prices: tuple,
+        subtotal: int,
+    ) -> None:
+        self.id = id
+        self.version = version
+        self.records = records
+        self.prices = prices
+        self.subtotal = subtotal
+
+    def __len__(self) -> int:
+        return len(self.records)
 
 
 class Order(list):
+    """List of quotes which notifies subscribers of every change
+
+    Subscribers are called as callback(event, index, quote) where event is
+    one of "insert", "remove", "edit", "clear", "id" or "reprice".
+
+    The subtotal and each quote's record, price and summary are cached, and
+    kept up to date incrementally as quotes are added, removed or edited.
+
+    The order is only changed on the Tk main thread, under a lock. Other
+    threads read it through snapshot(), which only takes the lock when the
+    order has changed since the last snapshot, and post changes back
+    through an UpdateQueue.
+    """
+
     def __init__(self, id: int = 1) -> None:
         super().__init__()
-        self.id = id
+        self._subscribers = []
+        self._id = id
+        self._lock = threading.RLock()
+
+        # Cache entries of [price, summary, occurrences, record] per quote
+        self._cache = {}
+        self._stale = set()
+        self._subtotal = 0
+
+        # Indices of each quote, or None until rebuilt after a change in
+        # the middle of the order
+        self._positions = {}
+
+        # Latest published snapshot, or None once the order has changed
+        self._version = 0
+        self._snapshot = None
+
+    @property
+    def id(self) -> int:
+        return self._id
+
+    @id.setter
+    def id(self, value: int) -> None:
+        with self._lock:
+            self._id = value
+            self._changed()
+            self._notify("id")
+
+    def subscribe(self, callback) -> None:
+        """Registers a callback to be run after every change"""
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback) -> None:
+        self._subscribers.remove(callback)
+
+    def _notify(self, event: str, index: int = None, quote=None) -> None:
+        for callback in self._subscribers:
+            callback(event, index, quote)
+
+    def _changed(self) -> None:
+        """Retires the published snapshot"""
+        self._version += 1
+        self._snapshot = None
+
+    def _track(self, quote: Quote) -> None:
+        """Adds a quote occurrence to the cache"""
+        entry = self._cache.get(quote)
+        if entry is None:
+            record = quote.record()
+            price = pricing.quote_total(record, tariff=Quote.tariff)
+            entry = self._cache[quote] = [price, None, 0, record]
+            quote.subscribe(self._quote_changed)
+        entry[2] += 1
+        self._subtotal += entry[0]
+        self._changed()
+
+    def _untrack(self, quote: Quote) -> None:
+        """Removes a quote occurrence from the cache"""
+        self._refresh_stale()
+        entry = self._cache[quote]
+        entry[2] -= 1
+        self._subtotal -= entry[0]
+        if not entry[2]:
+            del self._cache[quote]
+            quote.unsubscribe(self._quote_changed)
+        self._changed()
+
+    def _quote_changed(self, quote: Quote) -> None:
+        """Invalidates the cached price and summary of an edited quote"""
+        with self._lock:
+            entry = self._cache[quote]
+            entry[1] = None
+            entry[3] = quote.record()
+            self._stale.add(quote)
+            self._changed()
+            for index in self._indices(quote):
+                self._notify("edit", index, quote)
+
+    def _indices(self, quote: Quote) -> list:
+        """Returns the indices of a quote in ascending order"""
+        if self._positions is None:
+            self._positions = {}
+            for index, item in enumerate(self):
+                self._positions.setdefault(item, []).append(index)
+        return self._positions.get(quote, [])
+
+    def _placed(self, index: int, quote: Quote) -> None:
+        """Records a quote inserted at an index"""
+        if self._positions is None:
+            return
+        if index == len(self) - 1:
+            self._positions.setdefault(quote, []).append(index)
+        else:
+            self._positions = None
 
+    def _displaced(self, index: int, quote: Quote) -> None:
+        """Records a quote removed from an index"""
+        if self._positions is None:
+            return
+        if index == len(self):
+            indices = self._positions[quote]
+            indices.pop()
+            if not indices:
+                del self._positions[quote]
+        else:
+            self._positions = None
+
+    def _refresh_stale(self) -> None:
+        """Re-prices quotes edited since the subtotal was last read"""
+        while self._stale:
+            quote = self._stale.pop()
+            entry = self._cache.get(quote)
+            if entry is not None:
+                price = pricing.quote_total(entry[3], tariff=Quote.tariff)
+                self._subtotal += (price - entry[0]) * entry[2]
+                entry[0] = price
+
+    def append(self, quote: Quote) -> None:
+        with self._lock:
+            super().append(quote)
+            self._track(quote)
+            self._placed(len(self) - 1, quote)
+            self._notify("insert", len(self) - 1, quote)
+
+    def extend(self, quotes) -> None:
+        with self._lock:
+            for quote in quotes:
+                self.append(quote)
+
+    def insert(self, index: int, quote: Quote) -> None:
+        with self._lock:
+            # Resolve the position list.insert would use
+            if index < 0:
+                index += len(self)
+            index = min(max(index, 0), len(self))
+
+            super().insert(index, quote)
+            self._track(quote)
+            self._placed(index, quote)
+            self._notify("insert", index, quote)
+
+    def pop(self, index: int = -1) -> Quote:
+        with self._lock:
+            quote = super().pop(index)
+            self._untrack(quote)
+            if index < 0:
+                index += len(self) + 1
+            self._displaced(index, quote)
+            self._notify("remove", index, quote)
+            return quote
+
+    def remove(self, quote: Quote) -> None:
+        with self._lock:
+            indices = self._indices(quote)
+            if not indices:
+                raise ValueError("quote is not in the order")
+            self.pop(indices[0])
+
+    def __delitem__(self, index) -> None:
+        if isinstance(index, slice):
+            quotes = list(self)
+            del quotes[index]
+            self._replace(quotes)
+        else:
+            self.pop(index)
+
+    def __setitem__(self, index, quote) -> None:
+        with self._lock:
+            if isinstance(index, slice):
+                quotes = list(self)
+                quotes[index] = quote
+                self._replace(quotes)
+                return
+            index = range(len(self))[index]
+            self.pop(index)
+            self.insert(index, quote)
+
+    def __iadd__(self, quotes) -> "Order":
+        self.extend(quotes)
+        return self
+
+    def __imul__(self, count: int) -> "Order":
+        with self._lock:
+            if count <= 0:
+                self.clear()
+            else:
+                self.extend(list(self) * (count - 1))
+        return self
+
+    def sort(self, *, key=None, reverse: bool = False) -> None:
+        self._replace(sorted(self, key=key, reverse=reverse))
+
+    def reverse(self) -> None:
+        self._replace(self[::-1])
+
+    def _replace(self, quotes: list) -> None:
+        """Replaces the whole order, notifying a clear and each insert"""
+        with self._lock:
+            self.clear()
+            self.extend(quotes)
+
+    def clear(self) -> None:
+        with self._lock:
+            super().clear()
+            for quote in self._cache:
+                quote.unsubscribe(self._quote_changed)
+            self._cache.clear()
+            self._stale.clear()
+            self._positions = {}
+            self._subtotal = 0
+            self._changed()
+            self._notify("clear")
+
+    def reprice(self) -> None:
+        """Re-prices every quote after a change of tariff"""
+        with self._lock:
+            for quote, entry in self._cache.items():
+                self._stale.add(quote)
+                entry[1] = None
+            self._changed()
+            self._notify("reprice")
+
+    def snapshot(self) -> OrderSnapshot:
+        """Returns an immutable copy of the order, safe to read from any
+        thread"""
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+
+        with self._lock:
+            if self._snapshot is None:
+                self._refresh_stale()
+                entries = [self._cache[quote] for quote in self]
+                self._snapshot = OrderSnapshot(
+                    self._id,
+                    self._version,
+                    tuple([entry[3] for entry in entries]),
+                    tuple([entry[0] for entry in entries]),
+                    self._subtotal,
+                )
+            return self._snapshot
+
+    def get_price(self, quote: Quote) -> int:
+        """Returns the cached price of a quote in pence"""
+        with self._lock:
+            if quote not in self._cache:
+                return quote.get_total()
+            self._refresh_stale()
+            return self._cache[quote][0]
+
+    def get_summaries(self, start: int = 0, stop: int = None) -> list:
+        """Returns the summaries of a slice of the order, formatting those
+        not already cached together from their cached prices"""
+        with self._lock:
+            quotes = self[start:stop]
+            self._refresh_stale()
+
+            missing = [
+                self._cache[quote]
+                for quote in quotes
+                if self._cache[quote][1] is None
+            ]
+            if missing:
+                summaries = pricing.summarise_all(
+                    [entry[3] for entry in missing],
+                    [entry[0] for entry in missing],
+                )
+                for entry, summary in zip(missing, summaries):
+                    entry[1] = summary
+
+            return [self._cache[quote][1] for quote in quotes]
+
+    @instrument.timed("Order.get_total")
     def get_total(self) -> int:
         """Returns the order total in pence"""
-        return sum([quote.get_total() for quote in self])
+        with self._lock:
+            self._refresh_stale()
+            return self._subtotal
+
+    def cutting_plan(
+        self, roll_width: float = cutting.ROLL_WIDTH
+    ) -> cutting.CuttingPlan:
+        """Returns the plan for cutting every quote's sheet from rolls"""
+        return cutting.plan_order(
+            self.snapshot().records, roll_width, Quote.tariff.overlap
+        )
+
+    @instrument.timed("Order.export")
+    def export(self, target=None, format: str = "text") -> str:
+        """Exports the order to an external file and returns its name
+
+        The target may be a path or an open file object, and defaults to a
+        file in the working directory named by date and order number.
+        """
+        snapshot = self.snapshot()
+        target, order = self._export_fields(snapshot, target, format)
+        return export.export_order(
+            target, _snapshot_lines(snapshot), format, **order
+        )
+
+    def export_async(
+        self,
+        writer: "export.ExportWriter",
+        target=None,
+        format: str = "text",
+        on_progress=None,
+        on_done=None,
+    ):
+        """Queues an export of the order as it is now on a background
+        writer, returning a future of the file name
+
+        The order may change, or be replaced by a new one, while the export
+        is written. Callbacks are as for ExportWriter.submit.
+        """
+        snapshot = self.snapshot()
+        target, order = self._export_fields(snapshot, target, format)
+        return writer.submit(
+            target,
+            _snapshot_lines(snapshot),
+            format,
+            on_progress,
+            on_done,
+            **order,
+        )
+
+    def _export_fields(
+        self, snapshot: OrderSnapshot, target, format: str
+    ) -> tuple:
+        """Returns the target and order fields of an export"""
+        if format not in export.FORMATS:
+            raise ValueError(f"unknown export format: {format!r}")
 
-    def export(self) -> str:
-        """Exports the order to an external text file"""
         datestamp = time.strftime("%d-%m-%y")
-        header = [
-            f"{'=' * 20} Spence's International - {STORE} {'=' * 20}",
-            "Thank you for your purchase!",
-            f"Order Number: {self.id}",
-            f"Date: {datestamp}",
-            f"Items: {len(self)}",
-            f"Subtotal: {display_pounds(self.get_total())}",
-            f"{'-' * 31} Order Contents {'-' * 31}",
-        ]
+        if target is None:
+            target = export.default_filename(snapshot.id, datestamp, format)
+        return target, {
+            "order_id": snapshot.id,
+            "items": len(snapshot),
+            "subtotal": snapshot.subtotal,
+            "store": Quote.tariff.store,
+            "datestamp": datestamp,
+        }
+
 
-        filename = f"Export - {datestamp} - Order #{self.id}.txt"
-        with open("./" + filename, "w") as export:
-            [header.append(str(quote)) for quote in self]
-            [export.write(line + "\n") for line in header]
-        return filename
+def _snapshot_lines(snapshot: OrderSnapshot):
+    """Yields export lines for a snapshot, formatting each summary from the
+    same record and price as it is written, on the writer's thread"""
+    summaries = pricing.iter_summaries(snapshot.records, snapshot.prices)
+    yield from zip(snapshot.records, snapshot.prices, summaries)
 
 
 class WidgetStore(dict):
@@ -264,11 +702,268 @@ class WidgetStore(dict):
                 self[group] = [contents]
 
 
+class QuoteList(ttk.Frame):
+    """Listbox showing only the visible rows of an order
+
+    Summaries are only formatted for the rows in view, so the cost of a
+    refresh depends on the number of rows rather than the order size.
+    Selections are reported as order indices.
+    """
+
+    def __init__(self, parent, order: Order, rows: int = 30) -> None:
+        super().__init__(parent)
+
+        self._order = order
+        self._rows = rows
+        self._top = 0  # Order index of the first visible row
+        self._selected = None  # Order index of the selected quote
+        self._render_id = None
+
+        # Keep the selection when text is selected in another widget
+        self.listbox = tk.Listbox(self, height=rows, exportselection=False)
+        self._scrollbar = ttk.Scrollbar(
+            self, orient=tk.VERTICAL, command=self._scroll
+        )
+
+        self.listbox.bind("<<ListboxSelect>>", self._select)
+        self.listbox.bind("<Up>", lambda event: self._step(-1))
+        self.listbox.bind("<Down>", lambda event: self._step(1))
+        self.listbox.bind("<MouseWheel>", self._wheel)
+        self.listbox.bind(
+            "<Button-4>", lambda event: self._scroll("scroll", -1, "units")
+        )
+        self.listbox.bind(
+            "<Button-5>", lambda event: self._scroll("scroll", 1, "units")
+        )
+
+        self.listbox.grid(row=0, column=0, sticky="NESW")
+        self._scrollbar.grid(row=0, column=1, sticky="NS")
+
+    def curselection(self) -> tuple:
+        return () if self._selected is None else (self._selected,)
+
+    def changed(self, event: str, index: int) -> None:
+        """Adjusts the view for a single order change"""
+        if event == "clear":
+            self._top = 0
+            self._selected = None
+
+        elif event == "reprice":
+            self._schedule_render()
+            return
+
+        elif event == "insert":
+            if self._selected is not None and index <= self._selected:
+                self._selected += 1
+            # Keep the same quotes in view when inserting above them
+            if index < self._top:
+                self._top += 1
+                self._update_scrollbar()
+                return
+
+        elif event == "remove":
+            if self._selected == index:
+                self._selected = None
+            elif self._selected is not None and index < self._selected:
+                self._selected -= 1
+            if index < self._top:
+                self._top -= 1
+                self._update_scrollbar()
+                return
+
+        # Changes below the visible rows only move the scrollbar
+        if index is not None and index >= self._top + self._rows:
+            self._update_scrollbar()
+            return
+
+        self._schedule_render()
+
+    def _schedule_render(self) -> None:
+        if self._render_id is None:
+            self._render_id = self.after_idle(self._render)
+
+    @instrument.timed("QuoteList._render")
+    def _render(self) -> None:
+        """Redraws the visible rows from the order"""
+        self._render_id = None
+        count = len(self._order)
+        self._top = min(max(self._top, 0), max(count - self._rows, 0))
+        bottom = min(count, self._top + self._rows)
+
+        self.listbox.delete(0, tk.END)
+        if bottom > self._top:
+            self.listbox.insert(
+                0, *self._order.get_summaries(self._top, bottom)
+            )
+
+        if self._selected is not None and self._top <= self._selected < bottom:
+            self.listbox.selection_set(self._selected - self._top)
+
+        self._update_scrollbar()
+
+    def _update_scrollbar(self) -> None:
+        count = len(self._order)
+        if count <= self._rows:
+            self._scrollbar.set(0, 1)
+        else:
+            self._scrollbar.set(
+                self._top / count, min(1, (self._top + self._rows) / count)
+            )
+
+    def _scroll(self, action: str, amount, unit: str = None) -> None:
+        """Handles scrollbar commands and mouse wheel scrolling"""
+        if action == "moveto":
+            self._top = int(float(amount) * len(self._order))
+        elif unit == "pages":
+            self._top += int(amount) * self._rows
+        else:
+            self._top += int(amount)
+        self._schedule_render()
+
+    def _wheel(self, event) -> None:
+        """Scrolls a row per notch, or per event for wheels that report
+        deltas smaller than a notch"""
+        if abs(event.delta) >= 120:
+            self._scroll("scroll", -int(event.delta / 120), "units")
+        elif event.delta:
+            self._scroll("scroll", -1 if event.delta > 0 else 1, "units")
+
+    def _select(self, event) -> None:
+        selection = self.listbox.curselection()
+        self._selected = self._top + selection[0] if selection else None
+
+    def _step(self, offset: int) -> str:
+        """Moves the selection by one row, scrolling to keep it in view"""
+        if not self._order:
+            return "break"
+
+        if self._selected is None:
+            self._selected = self._top
+        else:
+            self._selected = min(
+                max(self._selected + offset, 0), len(self._order) - 1
+            )
+
+        if self._selected < self._top:
+            self._top = self._selected
+        elif self._selected >= self._top + self._rows:
+            self._top = self._selected - self._rows + 1
+
+        self._schedule_render()
+        return "break"
+
+
+class UpdateQueue:
+    """Runs callbacks on the Tk main loop, whichever thread posts them
+
+    Only the thread that created the queue may touch Tk or change the
+    order, so worker threads post their changes here instead. Callbacks
+    run in the order they were posted, once Tk is next idle for posts from
+    the main thread, and from a virtual event for posts from other
+    threads. Tk is only woken when the queue goes from empty to non-empty,
+    so an idle queue costs nothing.
+    """
+
+    EVENT = "<<Updates>>"
+
+    def __init__(self, widget: tk.Misc = None) -> None:
+        self._widget = widget
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.get_ident()
+        self._scheduled = False
+        self._closed = False
+        if widget is not None:
+            widget.bind(UpdateQueue.EVENT, self._drain_event, add="+")
+
+    def post(self, callback, *args) -> None:
+        """Queues callback(*args) to run on the main thread"""
+        self._queue.put((callback, args))
+        if self._widget is None or self._scheduled or self._closed:
+            return
+
+        self._scheduled = True
+        if threading.get_ident() == self._thread:
+            self._widget.after_idle(self.drain)
+            return
+        try:
+            self._widget.event_generate(UpdateQueue.EVENT, when="tail")
+        except (RuntimeError, tk.TclError):  # Main loop no longer running
+            self._scheduled = False
+
+    def drain(self) -> int:
+        """Runs every queued callback, returning how many ran"""
+        self._scheduled = False
+        count = 0
+        while True:
+            try:
+                callback, args = self._queue.get_nowait()
+            except queue.Empty:
+                return count
+            callback(*args)
+            count += 1
+
+    def close(self) -> None:
+        """Stops waking Tk once its main loop has ended"""
+        self._closed = True
+
+    def _drain_event(self, event: tk.Event) -> None:
+        self.drain()
+
+
+class Resources:
+    """Fonts and ttk styles shared by every window, created on first use"""
+
+    FONTS = {
+        "Heading": {"family": "Noto Sans", "size": 11, "weight": "bold"},
+        "Total": {"family": "Noto Sans", "size": 12, "weight": "bold"},
+        "Title": {"family": "Noto Sans", "size": 15, "weight": "bold"},
+        "Body": {"family": "Noto Sans", "size": 13},
+    }
+    STYLES = {
+        "Overview": {
+            "TButton": {"background": "#F8F8F8", "relief": "solid"},
+            "TLabel": {"background": "#F8F8F8"},
+            "TFrame": {"background": "#F8F8F8"},
+            "Highlight.TFrame": {"background": "#FF9200"},
+        },
+        "Configurator": {
+            "TRadiobutton": {"background": "##ECECEC"},
+            "TCheckbutton": {"background": "#F8F8F8"},
+            "TLabelframe": {"background": "#F8F8F8"},
+        },
+    }
+
+    _fonts = {}
+    _styled = set()
+
+    @classmethod
+    def font(cls, name: str) -> font.Font:
+        try:
+            return cls._fonts[name]
+        except KeyError:
+            font_ = cls._fonts[name] = font.Font(**cls.FONTS[name])
+            return font_
+
+    @classmethod
+    def style(cls, window: tk.Misc, group: str) -> None:
+        """Configures a group of ttk styles the first time it is needed"""
+        if group in cls._styled:
+            return
+        style = ttk.Style(window)
+        for name, options in cls.STYLES[group].items():
+            style.configure(name, **options)
+        cls._styled.add(group)
+
+
 # Window Classes
 class Overview(tk.Tk):
     """Shows an overview of the current order"""
 
+    STORE_FLUSH_INTERVAL = 250  # Milliseconds order changes may stay unsaved
+    TARIFF_POLL_INTERVAL = 2000  # Milliseconds between tariff file checks
+
     def __init__(self) -> None:
+        started = time.perf_counter()
         super().__init__()
         self.resizable(False, False)
 
@@ -278,20 +973,28 @@ class Overview(tk.Tk):
         self.option_add("*Font", font_)
 
         # Create Window Styles
-        self.style = ttk.Style(self)
-        self.style.configure("TButton", background="#F8F8F8", relief="solid")
-        self.style.configure("TRadiobutton", background="##ECECEC")
-        self.style.configure("TCheckbutton", background="#F8F8F8")
-        self.style.configure("TLabel", background="#F8F8F8")
-        self.style.configure("TLabelframe", background="#F8F8F8")
-        self.style.configure("TFrame", background="#F8F8F8")
-        self.style.configure("Highlight.TFrame", background="#FF9200")
+        Resources.style(self, "Overview")
+        self._startup = [("Tk and styles", time.perf_counter() - started)]
 
         # Variables
-        self.order = Order()
+        self.tariffs = tariffs.TariffTable(TARIFF_PATH, STORE)
+        self._reload_tariffs()
+        self.store = OrderStore(ORDER_STORE_PATH, STORE)
+        order_id, records = self.store.restore()
+        self.order = Order(order_id)
+        self.updates = UpdateQueue(self)
+        self.exports = export.ExportWriter(self.updates.post)
+        self._exports_running = Counter()  # Exports by status display
+        self._export_status = ""
+        self._store_flush_id = None
+        self._started = started
+
+        # Secondary windows, built on first use and then reused
+        self._configurator = None
+        self._checkout_window = None
+        self._shortcuts_guide = None
 
         # Tk Display Variables
-        self._quotes = tk.StringVar()
         self._order_total = tk.StringVar()
         self._total_items = tk.StringVar()
 
@@ -303,17 +1006,131 @@ class Overview(tk.Tk):
         self._construct()
         self._stylize()
         self._pack()
+        self._mark_startup("Widgets")
+
+        # Recover the open order before journalling further changes
+        self.order.subscribe(self._order_changed)
+        self.order.extend(Quote.from_record(record) for record in records)
+        self.order.subscribe(self._journal_change)
+        self._update_title()
+        self._update_totals()
+        self._mark_startup("Order recovery")
+
+        self.after(Overview.TARIFF_POLL_INTERVAL, self._poll_tariffs)
+        instrument.watch_event_loop(self)
+        instrument.install_signal_handler(self)
 
     def show(self) -> None:
-        threading.Thread(target=self._synchronise, daemon=True).start()
+        self.after_idle(self._first_frame)
         self.mainloop()
+        self.updates.close()
+        self.exports.shutdown()
+        self.store.close()
+
+    def startup_report(self) -> str:
+        """Returns the time taken by each startup phase"""
+        lines = [
+            f"{phase:<20}{seconds * 1000:>9.1f} ms"
+            for phase, seconds in self._startup
+        ]
+        total = sum(seconds for _, seconds in self._startup)
+        lines.append(f"{'Time to first frame':<20}{total * 1000:>9.1f} ms")
+        return "\n".join(lines)
+
+    def _mark_startup(self, phase: str) -> None:
+        elapsed = time.perf_counter() - self._started
+        self._startup.append(
+            (phase, elapsed - sum(seconds for _, seconds in self._startup))
+        )
+
+    def _first_frame(self) -> None:
+        """Records startup timings once the first frame has been drawn"""
+        self._mark_startup("First frame")
+        for phase, seconds in self._startup:
+            instrument.record(f"Startup: {phase}", seconds)
+        if instrument.ENABLED:
+            sys.stderr.write(self.startup_report() + "\n")
+
+    def start_new_order(self) -> None:
+        """Closes the current order and opens an empty one"""
+        self.store.close_order(self.order.id)
+        self.order.id = self.store.allocate_order_id()
+        self.order.clear()
+
+    def _reload_tariffs(self) -> bool:
+        """Applies any change to the tariff file, returning whether prices
+        changed"""
+        try:
+            changed = self.tariffs.reload()
+        except tariffs.TariffError as error:
+            messagebox.showerror(
+                "Tariff Error", f"Keeping current prices.\n{error}"
+            )
+            return False
+
+        Quote.tariff = self.tariffs.tariff
+        return changed
+
+    def _poll_tariffs(self) -> None:
+        if self._reload_tariffs():
+            self.order.reprice()
+            if self._configurator is not None:
+                self._configurator.reprice()
+        self.after(Overview.TARIFF_POLL_INTERVAL, self._poll_tariffs)
+
+    def export_order(self, show_status=None) -> None:
+        """Exports the current order in the background, passing progress
+        to show_status(text) until it is written, where the default shows
+        it in the title"""
+        if show_status is None:
+            show_status = self._show_export_status
+
+        def progress(written: int, items: int) -> None:
+            percent = written * 100 // items if items else 100
+            show_status(f"Exporting {percent}%")
+
+        def done(filename: str, error: Exception) -> None:
+            self._exports_running[show_status] -= 1
+            if not self._exports_running[show_status]:
+                del self._exports_running[show_status]
+                show_status("")
+            self._export_done(filename, error)
+
+        self._exports_running[show_status] += 1
+        self.order.export_async(
+            self.exports, on_progress=progress, on_done=done
+        )
+        progress(0, len(self.order))
+
+    def _show_export_status(self, text: str) -> None:
+        self._export_status = f" - {text}" if text else ""
+        self._update_title()
+
+    def _export_done(self, filename: str, error: Exception) -> None:
+        if error is not None:
+            messagebox.showerror("Export Error", f"Export failed:\n{error}")
+        else:
+            messagebox.showinfo("Export", f"Order Exported as:\n{filename}")
 
     def _export_to_file(self) -> None:
         if not self.order:
             messagebox.showerror("Export Error", "Current order is empty")
         else:
-            filename = self.order.export()
-            messagebox.showinfo("Export", f"Order Exported as:\n{filename}")
+            self.export_order()
+
+    def _show_cutting_plan(self) -> None:
+        if not self.order:
+            messagebox.showerror("Cutting Plan", "Current order is empty")
+        else:
+            messagebox.showinfo(
+                "Cutting Plan", cutting.report(self.order.cutting_plan())
+            )
+
+    def _dump_timings(self) -> None:
+        filename = f"Timings - {time.strftime('%d-%m-%y %H-%M-%S')}.txt"
+        with open("./" + filename, "w") as timings:
+            instrument.dump(timings)
+        messagebox.showinfo("Timings", f"Timings Written to:\n{filename}")
 
     def _construct(self) -> None:
         # Menu Bar
@@ -332,6 +1149,9 @@ class Overview(tk.Tk):
         file_menu.add_command(
             label="Export to File", command=self._export_to_file
         )
+        file_menu.add_command(
+            label="Cutting Plan", command=self._show_cutting_plan
+        )
         file_menu.add_separator()
         file_menu.add_command(label="Quit", command=self._quit)
         edit_menu.add_command(label="Add Quote", command=self._add_quote)
@@ -347,6 +1167,10 @@ class Overview(tk.Tk):
         help_menu.add_command(
             label="Shortcuts Guide", command=self._show_shortcuts
         )
+        if instrument.ENABLED:
+            help_menu.add_command(
+                label="Dump Timings", command=self._dump_timings
+            )
 
         self._menubar.add_cascade(label="File", menu=file_menu)
         self._menubar.add_cascade(label="Edit", menu=edit_menu)
@@ -360,7 +1184,7 @@ class Overview(tk.Tk):
 
         # Widgets
         self._widgets = [
-            tk.Listbox(self, listvariable=self._quotes),
+            QuoteList(self, self.order, rows=30),
             ttk.Label(self._centre_frame, textvariable=self._order_total),
             ttk.Label(self._centre_frame, textvariable=self._total_items),
             ttk.Button(
@@ -376,8 +1200,8 @@ class Overview(tk.Tk):
         self._lower_frame.configure(style="Highlight.TFrame")
 
         # Widgets
-        self._widgets[0].configure(
-            width=95, height=30, borderwidth=0, relief="solid"
+        self._widgets[0].listbox.configure(
+            width=95, borderwidth=0, relief="solid"
         )
 
     def _pack(self) -> None:
@@ -392,19 +1216,45 @@ class Overview(tk.Tk):
         self._centre_frame.grid(sticky="NESW")
         self._lower_frame.grid(sticky="NESW")
 
-    def _synchronise(self) -> None:
-        """Keeps the display synchronised with the current order object"""
-        while True:
-            self.title(f"Overview - Order #{self.order.id}")
+    def _order_changed(self, event: str, index: int, quote: Quote) -> None:
+        """Defers an order change notification to the Tk main loop"""
+        self.updates.post(self._apply_change, event, index, quote)
+
+    @instrument.timed("Overview._apply_change")
+    def _apply_change(self, event: str, index: int, quote: Quote) -> None:
+        """Keeps the display synchronised with a single order change"""
+        if event == "id":
+            self._update_title()
+            return
 
-            self._quotes.set([str(quote) for quote in self.order])
+        self._widgets[0].changed(event, index)
+        self._update_totals()
 
-            self._order_total.set(
-                f"Subtotal: {display_pounds(self.order.get_total())}"
+    def _journal_change(self, event: str, index: int, quote: Quote) -> None:
+        """Records an order change in the persistent store"""
+        if event in ("id", "reprice"):
+            return
+
+        record = None if event in ("remove", "clear") else quote.record()
+        self.store.record(self.order.id, event, index, record)
+
+        if self._store_flush_id is None:
+            self._store_flush_id = self.after(
+                Overview.STORE_FLUSH_INTERVAL, self._flush_store
             )
 
-            self._total_items.set(f"Items: {len(self.order)}")
-            time.sleep(0.5)
+    def _flush_store(self) -> None:
+        self._store_flush_id = None
+        self.store.flush()
+
+    def _update_title(self) -> None:
+        self.title(f"Overview - Order #{self.order.id}{self._export_status}")
+
+    def _update_totals(self) -> None:
+        self._order_total.set(
+            f"Subtotal: {display_pounds(self.order.get_total())}"
+        )
+        self._total_items.set(f"Items: {len(self.order)}")
 
     def _quit(self) -> None:
         if messagebox.askyesno(
@@ -412,19 +1262,23 @@ class Overview(tk.Tk):
         ):
             self.quit()
 
+    def _get_configurator(self) -> object:
+        if self._configurator is None:
+            self._configurator = Configurator(self)
+        return self._configurator
+
     def _add_quote(self, *args) -> None:
-        configurator = Configurator(self)
+        configurator = self._get_configurator()
         self.withdraw()
         configurator.show()
 
     def _edit_quote(self, *args) -> None:
         try:
             selected_index = self._widgets[0].curselection()[0]
-            configurator = Configurator(
-                self, self.order[selected_index], selected_index
-            )
+            quote = self.order[selected_index]
+            configurator = self._get_configurator()
             self.withdraw()
-            configurator.show()
+            configurator.show(quote, selected_index)
 
             self.order.pop(selected_index)
             self.active_configurator = True
@@ -451,62 +1305,86 @@ class Overview(tk.Tk):
                 "Checkout Error", "Cannot checkout with empty order"
             )
         else:
-            Checkout(self)
+            if self._checkout_window is None:
+                self._checkout_window = Checkout(self)
+            self._checkout_window.show()
             self.withdraw()
 
     def _show_shortcuts(self) -> None:
-        ShortcutsGuide(self)
+        if self._shortcuts_guide is None:
+            self._shortcuts_guide = ShortcutsGuide(self)
+        self._shortcuts_guide.show()
         self.withdraw()
 
 
 class Configurator(tk.Toplevel):
-    def __init__(
-        self, parent: Overview, quote: Quote = None, index: int = None
-    ) -> None:
+
+    # Number of dimension spinboxes used by each gift shape
+    SHAPE_DIMENSIONS = dimensions.SHAPE_FIELDS
+
+    def __init__(self, parent: Overview) -> None:
         super().__init__()
         self.resizable(False, False)
+        Resources.style(self, "Configurator")
 
         # Variables
         self._parent = parent
-        self._quote = Quote() if quote is None else quote
-        self._quote_index = index
+        self._quote = Quote()
+        self._quote_index = None
 
-        self._quote_unedited = self._quote.copy()
+        self._quote_unedited = None
         self._quote_total = tk.StringVar()
-        self._exit_flag = False
+
+        # Display parts awaiting a refresh on the next idle pass
+        self._dirty = set()
+        self._refresh_id = None
+        self._traces = []
 
         # Base Styling
         self.config(background="#F8F8F8")
 
         # Set Keybindings
         self.bind("<Control-s>", func=self._add_to_order)
+        self.protocol("WM_DELETE_WINDOW", self._cancel)
 
-        self.title(f"Quote Configurator - Order #{self._parent.order.id}")
         self._construct()
         self._stylize()
         self._pack()
 
-    def show(self) -> None:
-        self._sync_thread = threading.Thread(target=self._synchronise)
-        self._sync_thread.start()
-        self._validate_spinboxes()
-        self._update_preview()
-
-    def destroy(self, revert_changes: bool = True) -> None:
-        if revert_changes:
-            if self._quote_index is not None:
-                self._parent.order.insert(
-                    self._quote_index, self._quote_unedited
-                )
+    def show(self, quote: Quote = None, index: int = None) -> None:
+        """Opens the window on a new quote, or on an existing quote taken
+        from the given order index"""
+        self._quote = Quote() if quote is None else quote
+        self._quote_index = index
+        self._quote_unedited = self._quote.copy()
 
-        elif not self._validate_spinboxes():
+        self.title(f"Quote Configurator - Order #{self._parent.order.id}")
+        self._bind_variables()
+        for spinbox in self._widgets["DimensionInput"][1:4]:
+            spinbox.configure(to=Quote.tariff.max_size)
+        self.deiconify()
+
+        self._bind_traces()
+        self._mark_dirty(
+            "total", "preview", "label", "dimensions", "validation"
+        )
+
+    def reprice(self) -> None:
+        """Shows the open quote at the current tariff"""
+        if self.state() == "withdrawn":
             return
+        for spinbox in self._widgets["DimensionInput"][1:4]:
+            spinbox.configure(to=Quote.tariff.max_size)
+        self._mark_dirty("total", "validation")
 
-        self._exit_flag = True
-        self._sync_thread.join()
+    def close(self, revert_changes: bool = True) -> None:
+        if revert_changes and self._quote_index is not None:
+            self._parent.order.insert(self._quote_index, self._quote_unedited)
+
+        self._unbind_traces()
         self._parent.active_configurator = False
         self._parent.deiconify()
-        super().destroy()
+        self.withdraw()
 
     def _construct(self) -> None:
         """Creates frames and widgets"""
@@ -534,19 +1412,16 @@ class Configurator(tk.Toplevel):
                     self._shape_frame,
                     value=0,
                     text="Cube",
-                    variable=self._quote.gift.shape,
                 ),
                 tk.Radiobutton(
                     self._shape_frame,
                     value=1,
                     text="Cuboid",
-                    variable=self._quote.gift.shape,
                 ),
                 tk.Radiobutton(
                     self._shape_frame,
                     value=2,
                     text="Cylinder",
-                    variable=self._quote.gift.shape,
                 ),
             ],
         )
@@ -555,12 +1430,13 @@ class Configurator(tk.Toplevel):
             "DimensionInput",
             [
                 ttk.Label(self._size_frame, text="Gift Dimensions (CM)"),
-                ttk.Spinbox(self._size_frame, textvariable=self._quote.gift.x),
-                ttk.Spinbox(self._size_frame, textvariable=self._quote.gift.y),
-                ttk.Spinbox(self._size_frame, textvariable=self._quote.gift.z),
+                ttk.Spinbox(self._size_frame),
+                ttk.Spinbox(self._size_frame),
+                ttk.Spinbox(self._size_frame),
                 ttk.Label(self._size_frame, text="Width"),
                 ttk.Label(self._size_frame, text="Height"),
                 ttk.Label(self._size_frame, text="Depth"),
+                ttk.Label(self._size_frame, foreground="#C00000"),
             ],
         )
 
@@ -568,15 +1444,9 @@ class Configurator(tk.Toplevel):
             "LabelControl",
             [
                 ttk.Label(self._label_frame, text="Label"),
-                ttk.Checkbutton(
-                    self._label_frame,
-                    text="Include Label",
-                    variable=self._quote.includes_label,
-                ),
+                ttk.Checkbutton(self._label_frame, text="Include Label"),
                 ttk.Label(self._label_frame, text="Label Text"),
-                ttk.Entry(
-                    self._label_frame, textvariable=self._quote.label_text
-                ),
+                ttk.Entry(self._label_frame),
             ],
         )
 
@@ -584,11 +1454,7 @@ class Configurator(tk.Toplevel):
             "BowControl",
             [
                 ttk.Label(self._bow_frame, text="Bow"),
-                ttk.Checkbutton(
-                    self._bow_frame,
-                    text="Include Bow",
-                    variable=self._quote.includes_bow,
-                ),
+                ttk.Checkbutton(self._bow_frame, text="Include Bow"),
             ],
         )
 
@@ -609,22 +1475,14 @@ class Configurator(tk.Toplevel):
                     self._wrapping_frame,
                     value=0,
                     text="Cheap",
-                    variable=self._quote.wrapping_paper.quality,
-                    command=self._update_preview,
                 ),
                 tk.Radiobutton(
                     self._wrapping_frame,
                     value=1,
                     text="Expensive",
-                    variable=self._quote.wrapping_paper.quality,
-                    command=self._update_preview,
                 ),
                 ttk.Label(self._wrapping_frame, text="Paper Colour"),
-                ttk.Combobox(
-                    self._wrapping_frame,
-                    textvariable=self._quote.wrapping_paper.colour,
-                    values=Wrap.COLOURS,
-                ),
+                ttk.Combobox(self._wrapping_frame, values=Wrap.COLOURS),
             ],
         )
 
@@ -667,9 +1525,7 @@ class Configurator(tk.Toplevel):
 
         # Widgets
         for widgets in list(self._widgets.values())[:-1]:
-            widgets[0].configure(
-                font=font.Font(family="Noto Sans", size=11, weight="bold")
-            )
+            widgets[0].configure(font=Resources.font("Heading"))
 
         for radiobutton in self._widgets["ShapeSelection"][1:]:
             radiobutton.configure(
@@ -678,12 +1534,13 @@ class Configurator(tk.Toplevel):
                 activebackground="#F8F8F8",
             )
 
+        validate_key = self.register(self._validate_key)
         for spinbox in self._widgets["DimensionInput"][1:4]:
             spinbox.configure(
-                to=Gift.MAX_SIZE,
+                to=Quote.tariff.max_size,
                 width=7,
-                validate="focusout",  # Only suitable validation mode
-                validatecommand=self._validate_spinboxes,
+                validate="key",
+                validatecommand=(validate_key, "%P"),
             )
 
         self._widgets["LabelControl"][3].configure(width=27)
@@ -703,7 +1560,7 @@ class Configurator(tk.Toplevel):
         self._widgets["ControlBar"][1].configure(
             justify=tk.CENTER,
             background="#FF9200",
-            font=font.Font(family="Noto Sans", size=12, weight="bold"),
+            font=Resources.font("Total"),
         )
 
     def _pack(self) -> None:
@@ -737,6 +1594,9 @@ class Configurator(tk.Toplevel):
         self._widgets["DimensionInput"][6].grid(
             row=1, column=2, padx=x, pady=y
         )
+        self._widgets["DimensionInput"][7].grid(
+            row=2, column=0, columnspan=3, sticky="W", padx=x
+        )
 
         self._widgets["LabelControl"][1].grid(sticky="W", padx=x)
         self._widgets["LabelControl"][2].grid(sticky="W", padx=x)
@@ -773,96 +1633,136 @@ class Configurator(tk.Toplevel):
         self._right_frame.grid(row=0, column=1, padx=x, pady=y, sticky="N")
         self._lower_frame.grid(row=1, column=0, columnspan=2, sticky="NESW")
 
-    def _validate_spinboxes(self) -> bool:
-        for spinbox in self._widgets["DimensionInput"][1:4]:
+    def _bind_variables(self) -> None:
+        """Points every input widget at the current quote's variables"""
+        quote = self._quote
 
-            # Check for alpha characters
-            if any([char.isalpha() for char in spinbox.get()]):
-                messagebox.showerror(
-                    "Invalid Dimension",
-                    "Gift Dimensions Can't Contain Letters." +
-                    "\nPlease Only Enter Numerical Values.",
-                )
-                return False
-
-            # Check if spinbox is empty
-            elif not spinbox.get() or float(spinbox.get()) == 0:
-                messagebox.showerror(
-                    "Invalid Dimension",
-                    "Gift Dimensions Can't be Empty, Zero or Negative." +
-                    f"\nPlease Enter a Value Between 1 and {Gift.MAX_SIZE}.",
-                )
-                return False
-
-            # Check if value is negative
-            elif float(spinbox.get()) < 0:
-                messagebox.showerror(
-                    "Invalid Dimension",
-                    "Gift Dimensions Can't be Negative." +
-                    f"\nPlease Enter a Value Between 1 and {Gift.MAX_SIZE}.",
-                )
-                return False
-
-            # Check if value exceeds the maxium size
-            elif float(spinbox.get()) > Gift.MAX_SIZE:
-                messagebox.showerror(
-                    "Invalid Dimension",
-                    f"Gift Dimensions Exceed {Gift.MAX_SIZE} cm." +
-                    f"\nPlease Enter a Value Between 1 and {Gift.MAX_SIZE}.",
-                )
-                return False
+        for radiobutton in self._widgets["ShapeSelection"][1:]:
+            radiobutton.configure(variable=quote.gift.shape)
+
+        for spinbox, variable in zip(
+            self._widgets["DimensionInput"][1:4],
+            [quote.gift.x, quote.gift.y, quote.gift.z],
+        ):
+            spinbox.configure(textvariable=variable)
+
+        self._widgets["LabelControl"][1].configure(
+            variable=quote.includes_label
+        )
+        self._widgets["LabelControl"][3].configure(
+            textvariable=quote.label_text
+        )
+        self._widgets["BowControl"][1].configure(variable=quote.includes_bow)
+
+        for radiobutton in self._widgets["WrapSelection"][2:4]:
+            radiobutton.configure(variable=quote.wrapping_paper.quality)
+
+        self._widgets["WrapSelection"][5].configure(
+            textvariable=quote.wrapping_paper.colour
+        )
+
+    def _validate_key(self, text: str) -> bool:
+        """Rejects keystrokes that would put letters in a dimension"""
+        return dimensions.parse_field(text)[1] != dimensions.LETTERS
 
-        return True
+    def _validate_dimensions(self) -> bool:
+        """Explains the first invalid dimension, if there is one"""
+        errors = self._quote.gift.validate(Quote.tariff.max_size)
+        if errors:
+            messagebox.showerror("Invalid Dimension", errors[0].message)
+        return not errors
 
     def _update_preview(self) -> None:
         self._quote.wrapping_paper.draw(self._widgets["WrapPreview"][1])
 
-    def _synchronise(self) -> None:
-        """Synchronises the quote instance with the display contents"""
-        colour_cache = self._quote.wrapping_paper.colour.get()
+    def _bind_traces(self) -> None:
+        """Marks the display parts affected by each quote variable as dirty
+        whenever it is written"""
+        quote = self._quote
+        bindings = [
+            (quote.gift.shape, ("total", "dimensions", "validation")),
+            (quote.gift.x, ("total", "validation")),
+            (quote.gift.y, ("total", "validation")),
+            (quote.gift.z, ("total", "validation")),
+            (quote.wrapping_paper.quality, ("total", "preview")),
+            (quote.wrapping_paper.colour, ("preview",)),
+            (quote.includes_label, ("total", "label")),
+            (quote.label_text, ("total",)),
+            (quote.includes_bow, ("total",)),
+        ]
 
-        while not self._exit_flag:
+        for variable, parts in bindings:
+            trace = variable.trace_add(
+                "write", lambda *args, parts=parts: self._mark_dirty(*parts)
+            )
+            self._traces.append((variable, trace))
+
+    def _unbind_traces(self) -> None:
+        for variable, trace in self._traces:
+            variable.trace_remove("write", trace)
+        self._traces.clear()
+
+        if self._refresh_id is not None:
+            self.after_cancel(self._refresh_id)
+            self._refresh_id = None
+
+    def _mark_dirty(self, *parts: str) -> None:
+        """Schedules a refresh of the given display parts"""
+        self._dirty.update(parts)
+        if self._refresh_id is None:
+            self._refresh_id = self.after_idle(self._refresh)
+
+    @instrument.timed("Configurator._refresh")
+    def _refresh(self) -> None:
+        """Synchronises the dirty display parts with the quote instance"""
+        dirty, self._dirty = self._dirty, set()
+        self._refresh_id = None
+
+        if "total" in dirty:
             self._quote_total.set(
                 f"Total: {display_pounds(self._quote.get_total())}"
             )
 
-            # Check if Wrapping Colour has Changed
-            if colour_cache != self._quote.wrapping_paper.colour.get():
-                self._update_preview()
-                colour_cache = self._quote.wrapping_paper.colour.get()
+        if "preview" in dirty:
+            self._update_preview()
+
+        # Explain the first invalid dimension as it is typed
+        if "validation" in dirty:
+            errors = self._quote.gift.validate(Quote.tariff.max_size)
+            self._widgets["DimensionInput"][7].configure(
+                text=str(errors[0]).capitalize() if errors else ""
+            )
 
+        if "label" in dirty:
             if self._quote.includes_label.get():
                 self._widgets["LabelControl"][3].configure(state=tk.NORMAL)
             else:
                 self._widgets["LabelControl"][3].configure(state=tk.DISABLED)
 
-            # Enable and Disable Spinboxes
-            if self._quote.gift.shape.get() == 0:
-                self._widgets["DimensionInput"][1].configure(state=tk.NORMAL)
-                self._widgets["DimensionInput"][2].configure(state=tk.DISABLED)
-                self._widgets["DimensionInput"][3].configure(state=tk.DISABLED)
-
-            elif self._quote.gift.shape.get() == 1:
-                self._widgets["DimensionInput"][1].configure(state=tk.NORMAL)
-                self._widgets["DimensionInput"][2].configure(state=tk.NORMAL)
-                self._widgets["DimensionInput"][3].configure(state=tk.NORMAL)
-
-            else:
-                self._widgets["DimensionInput"][1].configure(state=tk.NORMAL)
-                self._widgets["DimensionInput"][2].configure(state=tk.NORMAL)
-                self._widgets["DimensionInput"][3].configure(state=tk.DISABLED)
-
-            time.sleep(0.1)
+        # Enable and Disable Spinboxes
+        if "dimensions" in dirty:
+            shape = self._quote.gift.shape.get()
+            enabled = Configurator.SHAPE_DIMENSIONS[shape]
+            for index, spinbox in enumerate(
+                self._widgets["DimensionInput"][1:4]
+            ):
+                spinbox.configure(
+                    state=tk.NORMAL if index < enabled else tk.DISABLED
+                )
 
     def _add_to_order(self, *args) -> None:
+        # Keep an invalid quote out of the order and its journal
+        if not self._validate_dimensions():
+            return
+
         if self._quote_index is None:
             self._parent.order.append(self._quote)
         else:
             self._parent.order.insert(self._quote_index, self._quote)
-        self.destroy(revert_changes=False)
+        self.close(revert_changes=False)
 
     def _cancel(self) -> None:
-        self.destroy(revert_changes=True)
+        self.close(revert_changes=True)
 
 
 class Checkout(tk.Toplevel):
@@ -875,12 +1775,27 @@ class Checkout(tk.Toplevel):
 
         # Base Styling
         self.config(background="#F8F8F8")
+        self.protocol("WM_DELETE_WINDOW", self.close)
 
-        self.title(f"Checkout - Order #{self._parent.order.id}")
         self._construct()
         self._stylize()
         self._pack()
 
+    def show(self) -> None:
+        """Opens the window on the parent's current order"""
+        order = self._parent.order
+        subtotal = display_pounds(order.get_total())
+
+        self.title(f"Checkout - Order #{order.id}")
+        self._widgets[0].configure(text=f"Order Number: {order.id}")
+        self._widgets[1].configure(text=f"Items: {len(order)}")
+        self._widgets[2].configure(text=f"Subtotal: {subtotal}")
+        self.deiconify()
+
+    def close(self) -> None:
+        self._parent.deiconify()
+        self.withdraw()
+
     def _construct(self) -> None:
         # Frames
         self._lower_frame = ttk.Frame(
@@ -889,12 +1804,9 @@ class Checkout(tk.Toplevel):
 
         # Widgets
         self._widgets = [
-            ttk.Label(self, text=f"Order Number: {self._parent.order.id}"),
-            ttk.Label(self, text=f"Items: {len(self._parent.order)}"),
-            ttk.Label(
-                self,
-                text=f"Subtotal: £0.00",
-            ),
+            ttk.Label(self),
+            ttk.Label(self),
+            ttk.Label(self),
             ttk.Button(
                 self._lower_frame, text="Quit Application", command=self._quit
             ),
@@ -908,24 +1820,28 @@ class Checkout(tk.Toplevel):
                 text="Export Order",
                 command=self._export_to_file,
             ),
+            ttk.Label(self),
         ]
 
     def _stylize(self) -> None:
         self._widgets[0].configure(
-            justify=tk.LEFT,
-            font=font.Font(family="Noto Sans", size=15, weight="bold"),
+            justify=tk.LEFT, font=Resources.font("Title")
         )
         self._widgets[1].configure(
-            justify=tk.LEFT, font=font.Font(family="Noto Sans", size=13)
+            justify=tk.LEFT, font=Resources.font("Body")
         )
         self._widgets[2].configure(
-            justify=tk.LEFT, font=font.Font(family="Noto Sans", size=13)
+            justify=tk.LEFT, font=Resources.font("Body")
+        )
+        self._widgets[6].configure(
+            justify=tk.LEFT, font=Resources.font("Body")
         )
 
     def _pack(self) -> None:
         self._widgets[0].grid(row=0, column=0, sticky="W", padx=5)
         self._widgets[1].grid(row=1, column=0, sticky="W", padx=5)
         self._widgets[2].grid(row=2, column=0, sticky="W", padx=5)
+        self._widgets[6].grid(row=3, column=0, sticky="W", padx=5)
 
         self._widgets[3].grid(row=0, column=0, padx=5)
         self._widgets[4].grid(row=0, column=1, padx=5)
@@ -936,14 +1852,14 @@ class Checkout(tk.Toplevel):
         self._parent.destroy()
 
     def _export_to_file(self) -> None:
-        filename = self._parent.order.export()
-        messagebox.showinfo("Export", f"Order Exported as:\n{filename}")
+        self._parent.export_order(self._show_export_status)
+
+    def _show_export_status(self, text: str) -> None:
+        self._widgets[6].configure(text=text)
 
     def _new_order(self) -> None:
-        self._parent.order.clear()
-        self._parent.order.id += 1
-        self._parent.deiconify()
-        self.destroy()
+        self._parent.start_new_order()
+        self.close()
 
 
 class ShortcutsGuide(tk.Toplevel):
@@ -963,10 +1879,18 @@ class ShortcutsGuide(tk.Toplevel):
         self._parent = parent
 
         self.title("Shortcuts Guide")
+        self.protocol("WM_DELETE_WINDOW", self.close)
         self._construct()
         self._populate_shortcuts()
         self._pack()
 
+    def show(self) -> None:
+        self.deiconify()
+
+    def close(self) -> None:
+        self._parent.deiconify()
+        self.withdraw()
+
     def _construct(self) -> None:
         # Frames
         self._lower_frame = ttk.Frame(
@@ -989,7 +1913,7 @@ class ShortcutsGuide(tk.Toplevel):
             selectbackground="#F8F8F8",
         )
         self._close_button = ttk.Button(
-            self._lower_frame, text="Close", command=self.destroy
+            self._lower_frame, text="Close", command=self.close
         )
 
     def _populate_shortcuts(self) -> None:
@@ -1006,10 +1930,6 @@ class ShortcutsGuide(tk.Toplevel):
         self._close_button.pack(side="left")
         self._lower_frame.grid(row=1, column=0, sticky="NESW", columnspan=2)
 
-    def destroy(self):
-        self._parent.deiconify()
-        super().destroy()
-
 
 # Program Initalisation
 if __name__ == "__main__":
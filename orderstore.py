@@ -0,0 +1,215 @@
+"""Crash-safe persistent order storage
+
+Changes to the open order are appended to a journal in a local SQLite
+database and committed in batches. On startup the open order is rebuilt by
+replaying its journal, and closing an order compacts its journal into plain
+order lines.
+"""
+
+import json
+import sqlite3
+import time
+
+import pricing
+
+BATCH_SIZE = 64  # Journal entries buffered before a commit
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY,
+    store TEXT NOT NULL,
+    status TEXT NOT NULL,
+    opened REAL NOT NULL,
+    closed REAL
+);
+CREATE TABLE IF NOT EXISTS journal (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_id INTEGER NOT NULL,
+    operation TEXT NOT NULL,
+    position INTEGER,
+    quote TEXT
+);
+CREATE INDEX IF NOT EXISTS journal_order ON journal (order_id, seq);
+CREATE TABLE IF NOT EXISTS lines (
+    order_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    quote TEXT NOT NULL,
+    PRIMARY KEY (order_id, position)
+);
+"""
+
+
+def encode_quote(quote: pricing.QuoteRecord) -> str:
+    gift, wrap = quote.gift, quote.wrap
+    return json.dumps(
+        [
+            gift.shape,
+            gift.x,
+            gift.y,
+            gift.z,
+            wrap.colour,
+            wrap.quality,
+            quote.includes_label,
+            quote.label_text,
+            quote.includes_bow,
+        ]
+    )
+
+
+def decode_quote(data: str) -> pricing.QuoteRecord:
+    shape, x, y, z, colour, quality, label, text, bow = json.loads(data)
+    return pricing.QuoteRecord(
+        pricing.GiftRecord(shape, x, y, z),
+        pricing.WrapRecord(colour, quality),
+        label,
+        text,
+        bow,
+    )
+
+
+def replay(entries) -> list:
+    """Returns the quote records left by a sequence of journal entries"""
+    quotes = []
+    for operation, position, data in entries:
+        if operation == "insert":
+            quotes.insert(position, decode_quote(data))
+        elif operation == "remove":
+            del quotes[position]
+        elif operation == "edit":
+            quotes[position] = decode_quote(data)
+        elif operation == "clear":
+            quotes.clear()
+    return quotes
+
+
+class OrderStore:
+    def __init__(self, path: str, store: str) -> None:
+        self.store = store
+        self._connection = sqlite3.connect(path, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+        self._pending = []
+
+    def allocate_order_id(self) -> int:
+        """Atomically reserves and opens the next order number"""
+        self.flush()
+        with self._transaction() as cursor:
+            row = cursor.execute(
+                "SELECT value FROM counters WHERE name = 'order'"
+            ).fetchone()
+            order_id = 1 if row is None else row[0] + 1
+            cursor.execute(
+                "INSERT OR REPLACE INTO counters VALUES ('order', ?)",
+                (order_id,),
+            )
+            cursor.execute(
+                "INSERT INTO orders VALUES (?, ?, 'open', ?, NULL)",
+                (order_id, self.store, time.time()),
+            )
+        return order_id
+
+    def restore(self) -> tuple:
+        """Returns (order id, quote records) for the most recent open order,
+        opening a new order if there is none"""
+        row = self._connection.execute(
+            "SELECT id FROM orders WHERE status = 'open' AND store = ? "
+            "ORDER BY id DESC LIMIT 1",
+            (self.store,),
+        ).fetchone()
+        if row is None:
+            return self.allocate_order_id(), []
+
+        return row[0], self._replay(row[0])
+
+    def record(
+        self,
+        order_id: int,
+        operation: str,
+        position: int = None,
+        quote: pricing.QuoteRecord = None,
+    ) -> None:
+        """Buffers a journal entry, committing once a batch is full"""
+        data = None if quote is None else encode_quote(quote)
+        self._pending.append((order_id, operation, position, data))
+        if len(self._pending) >= BATCH_SIZE:
+            self.flush()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def flush(self) -> None:
+        """Commits every buffered journal entry in one transaction"""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        with self._transaction() as cursor:
+            cursor.executemany(
+                "INSERT INTO journal (order_id, operation, position, quote) "
+                "VALUES (?, ?, ?, ?)",
+                pending,
+            )
+
+    def close_order(self, order_id: int) -> None:
+        """Marks an order closed and compacts its journal into order lines"""
+        self.flush()
+        quotes = self._replay(order_id)
+        with self._transaction() as cursor:
+            cursor.executemany(
+                "INSERT OR REPLACE INTO lines VALUES (?, ?, ?)",
+                [
+                    (order_id, position, encode_quote(quote))
+                    for position, quote in enumerate(quotes)
+                ],
+            )
+            cursor.execute(
+                "DELETE FROM journal WHERE order_id = ?", (order_id,)
+            )
+            cursor.execute(
+                "UPDATE orders SET status = 'closed', closed = ? WHERE id = ?",
+                (time.time(), order_id),
+            )
+
+    def close(self) -> None:
+        self.flush()
+        self._connection.close()
+
+    def _replay(self, order_id: int) -> list:
+        return replay(
+            self._connection.execute(
+                "SELECT operation, position, quote FROM journal "
+                "WHERE order_id = ? ORDER BY seq",
+                (order_id,),
+            )
+        )
+
+    def _transaction(self):
+        return transaction(self._connection)
+
+
+def transaction(connection) -> object:
+    """Returns a context manager running a block inside BEGIN IMMEDIATE on
+    an autocommit connection, which yields a cursor"""
+    return _Transaction(connection)
+
+
+class _Transaction:
+    """Runs a block inside BEGIN IMMEDIATE, committing or rolling back"""
+
+    def __init__(self, connection) -> None:
+        self._connection = connection
+
+    def __enter__(self):
+        self._connection.execute("BEGIN IMMEDIATE")
+        return self._connection.cursor()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self._connection.execute("COMMIT")
+        else:
+            self._connection.execute("ROLLBACK")
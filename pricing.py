@@ -0,0 +1,354 @@
+"""Headless pricing core shared by the Tk application and batch tools"""
+import math
+import threading
+
+from dimensions import parse_number
+
+# Pricing Constants
+OVERLAP = 3  # Overlap left on each side
+PRICES = {0: 0.4, 1: 0.75}  # Price Per Centimeter (In Pence) Low & High
+BOW_PRICE = 150  # Pence
+LABEL_PRICE = 50  # Pence
+LABEL_CHARACTER_PRICE = 2  # Pence per character of label text
+MAX_SIZE = 500  # Largest gift dimension accepted, in CM
+STORE = "Winchester"
+
+SHAPES = {0: "Cube", 1: "Cuboid", 2: "Cylinder"}
+COLOURS = [
+    "Purple",
+    "DarkSlateGray4",
+    "Deep Sky Blue",
+    "Light Sea Green",
+    "VioletRed2",
+    "Gold",
+]
+
+MAX_LABEL_SUMMARY_LENGTH = (
+    20  # Maximum number of label characters visible in quote summary
+)
+
+
+def display_pounds(pence: int) -> str:
+    return "£{0:0.2f}".format(pence / 100)
+
+
+# Records
+class _Record:
+    """Immutable base for plain-Python quote records"""
+
+    __slots__ = ()
+
+    def __init__(self, *values) -> None:
+        for name, value in zip(self.__slots__, values):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name: str, value) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def _values(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return self._values() == other._values()
+
+    def __hash__(self) -> int:
+        return hash((type(self).__name__,) + self._values())
+
+    def __reduce__(self) -> tuple:
+        return type(self), self._values()
+
+    def __repr__(self) -> str:
+        fields = ", ".join(
+            f"{name}={getattr(self, name)!r}" for name in self.__slots__
+        )
+        return f"{type(self).__name__}({fields})"
+
+
+class GiftRecord(_Record):
+
+    __slots__ = ("shape", "x", "y", "z")
+
+    def __init__(
+        self, shape: int = 0, x: float = 1, y: float = 1, z: float = 1
+    ) -> None:
+        super().__init__(shape, x, y, z)
+
+
+class WrapRecord(_Record):
+
+    __slots__ = ("colour", "quality")
+
+    def __init__(self, colour: str = COLOURS[0], quality: int = 0) -> None:
+        super().__init__(colour, quality)
+
+
+class QuoteRecord(_Record):
+
+    __slots__ = (
+        "gift",
+        "wrap",
+        "includes_label",
+        "label_text",
+        "includes_bow",
+    )
+
+    def __init__(
+        self,
+        gift: GiftRecord = None,
+        wrap: WrapRecord = None,
+        includes_label: int = 0,
+        label_text: str = "",
+        includes_bow: int = 0,
+    ) -> None:
+        super().__init__(
+            GiftRecord() if gift is None else gift,
+            WrapRecord() if wrap is None else wrap,
+            includes_label,
+            label_text,
+            includes_bow,
+        )
+
+
+class Tariff(_Record):
+    """Prices in force at one store, with paper prices indexed by quality"""
+
+    __slots__ = (
+        "store",
+        "prices",
+        "bow_price",
+        "label_price",
+        "label_character_price",
+        "overlap",
+        "max_size",
+    )
+
+    def __init__(
+        self,
+        store: str = STORE,
+        prices: tuple = tuple(PRICES[quality] for quality in sorted(PRICES)),
+        bow_price: int = BOW_PRICE,
+        label_price: int = LABEL_PRICE,
+        label_character_price: int = LABEL_CHARACTER_PRICE,
+        overlap: float = OVERLAP,
+        max_size: float = MAX_SIZE,
+    ) -> None:
+        super().__init__(
+            store,
+            prices,
+            bow_price,
+            label_price,
+            label_character_price,
+            overlap,
+            max_size,
+        )
+
+
+DEFAULT_TARIFF = Tariff()
+
+
+# Pricing Functions
+def parse_dimensions(shape: int, x, y, z) -> tuple:
+    """Returns dimensions as floats in width, height, depth order, or None if
+    any of the values used by the shape are not numeric"""
+    if shape == 0:
+        values = (x,)
+    elif shape == 1:
+        values = (x, y, z)
+    else:
+        values = (x, y)
+
+    dimensions = tuple([parse_number(value) for value in values])
+    return None if None in dimensions else dimensions
+
+
+def sheet_size(shape: int, dimensions: tuple, overlap: float = None) -> tuple:
+    """Returns the width and height in CM of the sheet cut to wrap a gift,
+    or None if the dimensions leave nothing to wrap"""
+    # Nothing to cut if dimensions are currently invalid
+    if dimensions is None:
+        return None
+
+    # If Cube
+    elif shape == 0:
+        if 0 in dimensions:
+            return None
+        wrap_width = dimensions[0] * 4
+        wrap_height = dimensions[0] * 3
+
+    # If Cuboid
+    elif shape == 1:
+        if dimensions.count(0) > 1:
+            return None
+        wrap_width = (dimensions[0] * 2) + (dimensions[1] * 2)
+        wrap_height = (dimensions[1] * 2) + dimensions[2]
+
+    # If Cylinder
+    else:
+        if 0 in dimensions:
+            return None
+        wrap_width = dimensions[0] * math.pi
+        wrap_height = (dimensions[0] * 2) + dimensions[1]
+
+    overlap = 2 * (OVERLAP if overlap is None else overlap)
+    return wrap_width + overlap, wrap_height + overlap
+
+
+def sheet_area(shape: int, dimensions: tuple, overlap: float = None) -> float:
+    """Returns amount of paper required to wrap a gift in CM2"""
+    size = sheet_size(shape, dimensions, overlap)
+    return 0 if size is None else size[0] * size[1]
+
+
+class AreaCache:
+    """Bounded, thread-safe memo of sheet areas
+
+    Entries are keyed on the overlap, shape and unparsed dimensions of a
+    gift, so a hit is a single dictionary lookup and callers pricing with
+    different overlaps keep their own entries.
+    """
+
+    def __init__(self, size: int = 4096) -> None:
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._areas = {}
+        self._lock = threading.Lock()
+
+    def area(self, gift: GiftRecord, overlap: float) -> float:
+        """Returns amount of paper required to wrap a gift in CM2"""
+        key = (overlap, gift.shape, gift.x, gift.y, gift.z)
+        with self._lock:
+            area = self._areas.get(key)
+            if area is not None:
+                self.hits += 1
+                return area
+            self.misses += 1
+
+        dimensions = parse_dimensions(gift.shape, gift.x, gift.y, gift.z)
+        area = sheet_area(gift.shape, dimensions, overlap)
+        with self._lock:
+            # Evict the oldest entry once full
+            if key not in self._areas and len(self._areas) >= self.size:
+                del self._areas[next(iter(self._areas))]
+            self._areas[key] = area
+        return area
+
+    def clear(self) -> None:
+        with self._lock:
+            self._areas.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._areas)
+
+
+AREA_CACHE = AreaCache()
+
+
+def gift_area(gift: GiftRecord, overlap: float = None) -> float:
+    """Returns amount of paper required to wrap the gift record in CM2"""
+    return AREA_CACHE.area(gift, OVERLAP if overlap is None else overlap)
+
+
+def quote_total(
+    quote: QuoteRecord,
+    prices: dict = None,
+    overlap: float = None,
+    tariff: Tariff = None,
+) -> int:
+    """Returns the quote record cost in pence
+
+    Prices come from the tariff, which defaults to the built-in prices.
+    Paper prices and overlap given separately take precedence over it.
+    """
+    tariff = DEFAULT_TARIFF if tariff is None else tariff
+    prices = tariff.prices if prices is None else prices
+    overlap = tariff.overlap if overlap is None else overlap
+
+    # Calculate paper cost ensuring to always round half up
+    total = math.ceil(
+        gift_area(quote.gift, overlap) * prices[quote.wrap.quality]
+    )
+
+    if quote.includes_bow:
+        total += tariff.bow_price
+
+    if quote.includes_label:
+        total += tariff.label_price + (
+            tariff.label_character_price * len(quote.label_text)
+        )
+
+    return total
+
+
+# Summary Formatting
+_format_summary = (
+    "[Cost: {}] - [Gift: {}, {} CM] - [Wrap: {}, {}] - [{}, {}]".format
+)
+_QUALITY_CODES = ("CHP", "EXP")
+
+
+def _dimensions_string(gift: GiftRecord) -> str:
+    """Returns the gift's dimensions as a WxHxD string"""
+    dimensions = parse_dimensions(gift.shape, gift.x, gift.y, gift.z)
+    return "x".join([str(round(value, 1)) for value in dimensions or ()])
+
+
+def _summary(quote: QuoteRecord, total: int, dimensions_string: str) -> str:
+    # Check if label is too long for full display
+    if quote.includes_label:
+        label_text = quote.label_text
+        if len(label_text) > MAX_LABEL_SUMMARY_LENGTH:
+            label_text = f"{label_text[:MAX_LABEL_SUMMARY_LENGTH - 4]}..."
+        label = f"LBL: {label_text}"
+    else:
+        label = "NO LABEL"
+
+    # Price, Shape, Size, Quality, Colour, Bow, Label, Label Text
+    return _format_summary(
+        display_pounds(total),
+        SHAPES[quote.gift.shape],
+        dimensions_string,
+        _QUALITY_CODES[1 if quote.wrap.quality else 0],
+        quote.wrap.colour,
+        "BOW" if quote.includes_bow else "NO BOW",
+        label,
+    )
+
+
+def summarise(quote: QuoteRecord, total: int = None) -> str:
+    """Returns a short string summarising the quote record"""
+    if total is None:
+        total = quote_total(quote)
+    return _summary(quote, total, _dimensions_string(quote.gift))
+
+
+def iter_summaries(quotes, totals, memo_size: int = 1024):
+    """Yields summaries of quote records already priced at the given
+    totals, one at a time, formatting each distinct set of dimensions once
+    while it is among the last memo_size seen"""
+    dimensions_strings = {}
+    for quote, total in zip(quotes, totals):
+        gift = quote.gift
+        key = (gift.shape, gift.x, gift.y, gift.z)
+        try:
+            dimensions_string = dimensions_strings[key]
+        except KeyError:
+            if len(dimensions_strings) >= memo_size:
+                dimensions_strings.clear()
+            dimensions_string = dimensions_strings[key] = _dimensions_string(
+                gift
+            )
+        yield _summary(quote, total, dimensions_string)
+
+
+def summarise_all(quotes, totals) -> list:
+    """Returns summaries of quote records already priced at the given
+    totals, formatting each distinct set of dimensions once"""
+    return list(iter_summaries(quotes, totals, memo_size=math.inf))
@@ -0,0 +1,407 @@
+"""Incremental revenue reports across every store's exports
+
+Exports from any number of stores are summarised into a local SQLite
+database as revenue, quote and label character counts for each
+combination of day, store, shape, quality, colour, bow and label. Each
+file is remembered by its modification time and size, so an update only
+reads files that are new or changed, and subtracts the contribution of
+files that changed or disappeared. Files are summarised in a pool of
+worker processes.
+
+Group-by queries only read the running totals, never the exports.
+
+    python reporting.py update exports/ --workers 4
+    python reporting.py query --by store,shape --since 2025-01-01
+"""
+
+import argparse
+import itertools
+import multiprocessing
+import os
+import sqlite3
+import sys
+
+import orderstore
+import pricing
+import reprice
+
+REPORT_PATH = "reports.db"
+CHUNK_SIZE = 16  # Files handed to a worker at a time
+COMMIT_SIZE = 64  # Files summarised per transaction
+
+DIMENSIONS = ("date", "store", "shape", "quality", "colour", "bow", "label")
+MEASURES = ("quotes", "revenue", "label_characters")
+UNKNOWN = -1  # Shape, quality, bow and label of lines without a record
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    store TEXT,
+    order_id TEXT,
+    date TEXT,
+    lines INTEGER NOT NULL,
+    errors INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS file_cells (
+    path TEXT NOT NULL,
+    date TEXT NOT NULL,
+    store TEXT NOT NULL,
+    shape INTEGER NOT NULL,
+    quality INTEGER NOT NULL,
+    colour TEXT NOT NULL,
+    bow INTEGER NOT NULL,
+    label INTEGER NOT NULL,
+    quotes INTEGER NOT NULL,
+    revenue INTEGER NOT NULL,
+    label_characters INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS file_cells_path ON file_cells (path);
+CREATE TABLE IF NOT EXISTS cells (
+    date TEXT NOT NULL,
+    store TEXT NOT NULL,
+    shape INTEGER NOT NULL,
+    quality INTEGER NOT NULL,
+    colour TEXT NOT NULL,
+    bow INTEGER NOT NULL,
+    label INTEGER NOT NULL,
+    quotes INTEGER NOT NULL,
+    revenue INTEGER NOT NULL,
+    label_characters INTEGER NOT NULL,
+    PRIMARY KEY (date, store, shape, quality, colour, bow, label)
+) WITHOUT ROWID;
+"""
+_KEY = ", ".join(DIMENSIONS)
+_VALUES = ", ".join("?" * (len(DIMENSIONS) + len(MEASURES)))
+_UPSERT = (
+    f"INSERT INTO cells VALUES ({_VALUES}) "
+    f"ON CONFLICT ({_KEY}) DO UPDATE SET "
+    + ", ".join(f"{name} = {name} + excluded.{name}" for name in MEASURES)
+)
+
+
+def iso_date(datestamp: str) -> str:
+    """Returns an export's dd-mm-yy date as yyyy-mm-dd, or unchanged if it
+    is not in that form"""
+    day, _, rest = (datestamp or "").partition("-")
+    month, _, year = rest.partition("-")
+    if (
+        not (len(day) == len(month) == len(year) == 2)
+        or not (day + month + year).isdigit()
+    ):
+        return datestamp or ""
+    return f"20{year}-{month}-{day}"
+
+
+def summarise_file(path: str) -> tuple:
+    """Returns (order, cells, lines, errors) for one export file, where
+    cells maps each dimension key to its measures, or raises
+    RepriceError if the file cannot be read"""
+    try:
+        order, lines = reprice.read_order(path)
+    except (OSError, UnicodeDecodeError) as error:
+        raise reprice.RepriceError(str(error)) from None
+
+    date = iso_date(order["date"])
+    store = order["store"] or ""
+    cells = {}
+    errors = 0
+    for line in lines:
+        if isinstance(line, reprice.RepriceError):
+            errors += 1
+            continue
+
+        quote, total = line
+        if quote is None:
+            key = (date, store, UNKNOWN, UNKNOWN, "", UNKNOWN, UNKNOWN)
+            characters = 0
+        else:
+            key = (
+                date,
+                store,
+                quote.gift.shape,
+                quote.wrap.quality,
+                quote.wrap.colour,
+                int(quote.includes_bow),
+                int(quote.includes_label),
+            )
+            characters = len(quote.label_text) if quote.includes_label else 0
+
+        cell = cells.get(key)
+        if cell is None:
+            cell = cells[key] = [0, 0, 0]
+        cell[0] += 1
+        cell[1] += total
+        cell[2] += characters
+
+    return order, cells, len(lines) - errors, errors
+
+
+def _summarise(path: str) -> tuple:
+    """Returns (path, summary, error) for the worker pool"""
+    try:
+        return path, summarise_file(path), None
+    except reprice.RepriceError as error:
+        return path, None, str(error)
+
+
+class ReportStore:
+    """Running totals of every export summarised so far"""
+
+    def __init__(self, path: str = REPORT_PATH) -> None:
+        self._connection = sqlite3.connect(path, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def update(
+        self, paths, workers: int = None, chunk_size: int = CHUNK_SIZE
+    ) -> dict:
+        """Summarises new and changed exports under the paths and drops
+        files that no longer exist, returning counts of files by outcome"""
+        known = {
+            path: (mtime_ns, size)
+            for path, mtime_ns, size in self._connection.execute(
+                "SELECT path, mtime_ns, size FROM files"
+            )
+        }
+        counts = dict.fromkeys(
+            ["added", "changed", "removed", "unchanged", "failed"], 0
+        )
+
+        signatures = {}
+        for path in reprice.find_exports(paths):
+            try:
+                status = os.stat(path)
+            except OSError:
+                counts["failed"] += 1
+                continue
+            signature = (status.st_mtime_ns, status.st_size)
+            if known.get(path) == signature:
+                counts["unchanged"] += 1
+            else:
+                signatures[path] = signature
+
+        missing = [path for path in known if not os.path.exists(path)]
+        with orderstore.transaction(self._connection) as cursor:
+            for path in missing:
+                self._forget(cursor, path)
+        counts["removed"] = len(missing)
+
+        summaries = self._summaries(list(signatures), workers, chunk_size)
+        while True:
+            batch = list(itertools.islice(summaries, COMMIT_SIZE))
+            if not batch:
+                break
+            with orderstore.transaction(self._connection) as cursor:
+                for path, summary, error in batch:
+                    if error is not None:
+                        counts["failed"] += 1
+                        sys.stderr.write(f"{path}: {error}\n")
+                        continue
+                    counts["changed" if path in known else "added"] += 1
+                    self._forget(cursor, path)
+                    self._add(cursor, path, signatures[path], *summary)
+        return counts
+
+    def query(
+        self,
+        by=("store",),
+        since: str = None,
+        until: str = None,
+        stores=None,
+    ) -> list:
+        """Returns rows of the chosen dimensions followed by quotes, revenue
+        and label characters, largest revenue first
+
+        Dates are yyyy-mm-dd and both ends of the range are included.
+        """
+        unknown = set(by) - set(DIMENSIONS)
+        if unknown:
+            raise ValueError(f"unknown dimensions: {sorted(unknown)}")
+
+        conditions = []
+        parameters = []
+        if since is not None:
+            conditions.append("date >= ?")
+            parameters.append(since)
+        if until is not None:
+            conditions.append("date <= ?")
+            parameters.append(until)
+        if stores:
+            conditions.append(f"store IN ({', '.join('?' * len(stores))})")
+            parameters.extend(stores)
+
+        columns = ", ".join(by)
+        sql = (
+            f"SELECT {columns + ', ' if by else ''}"
+            + ", ".join(f"SUM({name})" for name in MEASURES)
+            + " FROM cells"
+            + (f" WHERE {' AND '.join(conditions)}" if conditions else "")
+            + (f" GROUP BY {columns}" if by else "")
+            + f" ORDER BY {len(by) + 2} DESC"
+        )
+        return [
+            row
+            for row in self._connection.execute(sql, parameters)
+            if row[len(by)] is not None
+        ]
+
+    def _summaries(self, paths: list, workers: int, chunk_size: int):
+        if workers == 1 or len(paths) < 2:
+            yield from map(_summarise, paths)
+            return
+        with multiprocessing.Pool(workers) as pool:
+            yield from pool.imap_unordered(_summarise, paths, chunk_size)
+
+    def _forget(self, cursor, path: str) -> None:
+        """Subtracts a file's cells from the running totals"""
+        rows = cursor.execute(
+            f"SELECT {_KEY}, {', '.join(MEASURES)} FROM file_cells "
+            "WHERE path = ?",
+            (path,),
+        ).fetchall()
+        cursor.executemany(
+            _UPSERT,
+            [
+                row[: len(DIMENSIONS)]
+                + tuple(-value for value in row[len(DIMENSIONS) :])
+                for row in rows
+            ],
+        )
+        cursor.execute("DELETE FROM cells WHERE quotes = 0")
+        cursor.execute("DELETE FROM file_cells WHERE path = ?", (path,))
+        cursor.execute("DELETE FROM files WHERE path = ?", (path,))
+
+    def _add(
+        self,
+        cursor,
+        path: str,
+        signature: tuple,
+        order: dict,
+        cells: dict,
+        lines: int,
+        errors: int,
+    ) -> None:
+        rows = [key + tuple(measures) for key, measures in cells.items()]
+        cursor.execute(
+            "INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                path,
+                *signature,
+                order["store"],
+                order["order"],
+                order["date"],
+                lines,
+                errors,
+            ),
+        )
+        cursor.executemany(
+            f"INSERT INTO file_cells VALUES (?, {_VALUES})",
+            [(path,) + row for row in rows],
+        )
+        cursor.executemany(_UPSERT, rows)
+
+
+def _display(dimension: str, value) -> str:
+    if value == UNKNOWN and dimension != "date":
+        return "?"
+    if dimension == "shape":
+        return pricing.SHAPES.get(value, str(value))
+    if dimension == "quality":
+        return "EXP" if value else "CHP"
+    if dimension in ("bow", "label"):
+        return "yes" if value else "no"
+    return str(value or "(unknown)")
+
+
+def format_report(by, rows) -> str:
+    """Returns query rows as a table"""
+    lines = [
+        "".join(f"{name.title():<18}" for name in by)
+        + f"{'Quotes':>10}{'Revenue':>16}{'Label chars':>13}"
+    ]
+    for row in rows:
+        keys = row[: len(by)]
+        quotes, revenue, characters = row[len(by) :]
+        lines.append(
+            "".join(
+                f"{_display(name, value):<18}" for name, value in zip(by, keys)
+            )
+            + f"{quotes:>10}{pricing.display_pounds(revenue):>16}"
+            f"{characters:>13}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Report revenue across the exports of every store."
+    )
+    parser.add_argument(
+        "--database",
+        default=REPORT_PATH,
+        help=f"report database (default: {REPORT_PATH})",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    update = commands.add_parser(
+        "update", help="summarise new and changed exports"
+    )
+    update.add_argument(
+        "paths", nargs="+", help="export files or directories of exports"
+    )
+    update.add_argument(
+        "--workers",
+        type=int,
+        help="worker processes (default: one per CPU)",
+    )
+    update.add_argument(
+        "--chunk-size",
+        type=int,
+        default=CHUNK_SIZE,
+        help=f"files sent to a worker at a time (default: {CHUNK_SIZE})",
+    )
+
+    query = commands.add_parser("query", help="print a grouped report")
+    query.add_argument(
+        "--by",
+        type=lambda value: [name for name in value.split(",") if name],
+        default=["store"],
+        help=f"comma separated dimensions from {', '.join(DIMENSIONS)}",
+    )
+    query.add_argument("--since", help="first day included, as yyyy-mm-dd")
+    query.add_argument("--until", help="last day included, as yyyy-mm-dd")
+    query.add_argument(
+        "--store", action="append", help="only include a store, repeatable"
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == "query":
+        unknown = set(args.by) - set(DIMENSIONS)
+        if unknown:
+            parser.error(f"unknown dimensions: {', '.join(sorted(unknown))}")
+
+    store = ReportStore(args.database)
+    try:
+        if args.command == "update":
+            counts = store.update(args.paths, args.workers, args.chunk_size)
+            sys.stderr.write(
+                ", ".join(f"{count} {name}" for name, count in counts.items())
+                + "\n"
+            )
+            return 1 if counts["failed"] else 0
+
+        rows = store.query(args.by, args.since, args.until, args.store)
+        sys.stdout.write(format_report(args.by, rows) + "\n")
+        return 0
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
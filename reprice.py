@@ -0,0 +1,479 @@
+"""Bulk re-pricing of exported orders
+
+Reads order exports written by Order.export or export.py, in text, CSV or
+JSON Lines format, prices every line again with the current rules in
+pricing.py and writes one CSV row per order comparing the old and new
+totals. Files are spread over a pool of worker processes, and the lines
+of large files are split into parts across it. New prices can be taken
+from a store's tariff file instead.
+
+Text exports only hold quote summaries, so dimensions are re-priced at
+the one decimal place shown there and lines whose price moves are counted
+as imprecise rather than changed. Summaries whose label was cut short
+cannot be re-priced, and keep their old total in the new subtotal.
+
+    python reprice.py exports/ --workers 8 > diff.csv
+    python reprice.py exports/ --tariffs tariffs.json --store Winchester
+"""
+
+import argparse
+import collections
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import re
+import sys
+
+import cli
+import export
+import pricing
+
+CHUNK_SIZE = 16  # Files handed to a worker at a time
+SPLIT_SIZE = 1 << 22  # Bytes above which a file is priced in parts
+PART_LINES = 20_000  # Lines in each part of a split file
+FILE_FORMATS = {extension: name for name, extension in export.FORMATS.items()}
+DIFF_FIELDS = [
+    "file",
+    "order",
+    "lines",
+    "old_total",
+    "new_total",
+    "difference",
+    "changed",
+    "imprecise",
+    "unpriced",
+    "errors",
+]
+LINE_FIELDS = [
+    "lines",
+    "old_total",
+    "new_total",
+    "changed",
+    "imprecise",
+    "unpriced",
+    "errors",
+]
+
+SUMMARY_PATTERN = re.compile(
+    r"\[Cost: £(?P<pounds>\d+)\.(?P<pence>\d\d)\]"
+    r" - \[Gift: (?P<shape>\w+), ?(?P<dimensions>[^\]]*?) CM\]"
+    r" - \[Wrap: (?P<quality>EXP|CHP), (?P<colour>.*?)\]"
+    r" - \[(?P<bow>BOW|NO BOW), (?:NO LABEL|(?P<label>LBL: .*))\]"
+)
+TITLE_PATTERN = re.compile(r"=+ Spence's International - (?P<store>.*?) =+")
+ORDER_FIELDS = ["order", "store", "date", "subtotal"]
+SHAPE_NAMES = {name: code for code, name in pricing.SHAPES.items()}
+TRUNCATED_LABEL_LENGTH = pricing.MAX_LABEL_SUMMARY_LENGTH - 1
+
+
+class RepriceError(ValueError):
+    """Raised when an export line cannot be read back as a quote"""
+
+
+def parse_pounds(text: str) -> int:
+    """Returns a display_pounds amount in pence"""
+    match = re.fullmatch(r"£(\d+)\.(\d\d)", text.strip())
+    if match is None:
+        raise RepriceError(f"invalid amount: {text!r}")
+    return int(match[1]) * 100 + int(match[2])
+
+
+def parse_summary(line: str) -> tuple:
+    """Returns (quote record, total) for a quote summary line, with a record
+    of None when the summary does not hold enough detail to re-price"""
+    match = SUMMARY_PATTERN.fullmatch(line.rstrip("\n"))
+    if match is None or match["shape"] not in SHAPE_NAMES:
+        raise RepriceError(f"not a quote summary: {line.strip()!r}")
+
+    total = int(match["pounds"]) * 100 + int(match["pence"])
+
+    label = match["label"]
+    label_text = "" if label is None else label[len("LBL: ") :]
+    truncated = label_text.endswith("...")
+    if truncated and len(label_text) == TRUNCATED_LABEL_LENGTH:
+        return None, total
+
+    dimensions = match["dimensions"].split("x") if match["dimensions"] else []
+    x, y, z = (dimensions + [""] * 3)[:3]
+    quote = pricing.QuoteRecord(
+        pricing.GiftRecord(SHAPE_NAMES[match["shape"]], x, y, z),
+        pricing.WrapRecord(match["colour"], int(match["quality"] == "EXP")),
+        includes_label=int(label is not None),
+        label_text=label_text,
+        includes_bow=int(match["bow"] == "BOW"),
+    )
+    return quote, total
+
+
+def parse_row(row: dict) -> tuple:
+    """Returns (quote record, total) for a structured export row"""
+    try:
+        shape = cli.SHAPE_CODES[str(row["shape"]).lower()]
+        quality = cli.QUALITY_CODES[str(row["quality"]).lower()]
+        bow = cli.FLAG_VALUES[str(row["bow"] or "").lower()]
+        total = int(row["total"])
+    except (KeyError, TypeError, ValueError):
+        raise RepriceError(f"invalid export row: {row!r}") from None
+
+    # CSV writes a missing label as an empty field, so fall back on the
+    # summary to tell it apart from an empty label
+    label = row.get("label")
+    if label == "" and str(row.get("summary", "")).endswith("NO LABEL]"):
+        label = None
+
+    quote = pricing.QuoteRecord(
+        pricing.GiftRecord(
+            shape,
+            _dimension(row.get("width")),
+            _dimension(row.get("height")),
+            _dimension(row.get("depth")),
+        ),
+        pricing.WrapRecord(row.get("colour") or pricing.COLOURS[0], quality),
+        includes_label=int(label is not None),
+        label_text="" if label is None else str(label),
+        includes_bow=bow,
+    )
+    return quote, total
+
+
+def _dimension(value):
+    return "" if value is None else value
+
+
+def _parse_json_line(line: str) -> tuple:
+    """Returns (quote record, total) for a JSON Lines export line"""
+    try:
+        row = json.loads(line)
+    except ValueError:
+        raise RepriceError(f"invalid JSON line: {line.strip()!r}") from None
+    if not isinstance(row, dict):
+        raise RepriceError(f"invalid export row: {row!r}")
+    return parse_row(row)
+
+
+PARSERS = {
+    "text": parse_summary,
+    "csv": parse_row,
+    "jsonl": _parse_json_line,
+}
+
+
+def export_format(path: str) -> str:
+    """Returns the export format of a file from its extension"""
+    try:
+        return FILE_FORMATS[os.path.splitext(path)[1].lstrip(".").lower()]
+    except KeyError:
+        raise RepriceError("unknown export format") from None
+
+
+def read_order(path: str) -> tuple:
+    """Returns (order, lines) for an export file, where order holds the
+    order, store, date and subtotal the export records, each None when it
+    does not, and each line is a (quote record, total) pair or a
+    RepriceError"""
+    format = export_format(path)
+    with open(path, newline="", encoding="utf-8") as stream:
+        order, rows = _read(stream, format)
+        return order, list(_parse_each(PARSERS[format], rows))
+
+
+def _parse_each(parse, rows):
+    for row in rows:
+        try:
+            yield parse(row)
+        except RepriceError as error:
+            yield error
+
+
+def _order(header: dict) -> dict:
+    return {field: header.get(field) for field in ORDER_FIELDS}
+
+
+def _read(stream, format: str) -> tuple:
+    """Returns (order, rows) for an open export, where rows lazily yields
+    each line or CSV row for the format's parser"""
+    if format == "text":
+        return _read_text(stream)
+    if format == "csv":
+        return _read_csv(stream)
+    return _read_jsonl(stream)
+
+
+def _read_text(stream) -> tuple:
+    order = dict.fromkeys(ORDER_FIELDS)
+    for line in stream:
+        title = TITLE_PATTERN.fullmatch(line.rstrip("\n"))
+        if title is not None:
+            order["store"] = title["store"]
+        elif line.startswith("Order Number: "):
+            order["order"] = line[len("Order Number: ") :].strip()
+        elif line.startswith("Date: "):
+            order["date"] = line[len("Date: ") :].strip()
+        elif line.startswith("Subtotal: "):
+            order["subtotal"] = parse_pounds(line[len("Subtotal: ") :])
+        elif line.startswith("-"):
+            break
+    else:
+        raise RepriceError("missing order contents")
+
+    return order, (line for line in stream if line.strip())
+
+
+def _read_csv(stream) -> tuple:
+    reader = csv.DictReader(stream)
+    first = next(reader, None)
+    if first is None:
+        return _order({}), iter(())
+    return _order(first), itertools.chain([first], reader)
+
+
+def _read_jsonl(stream) -> tuple:
+    try:
+        header = json.loads(next(stream))
+    except (StopIteration, ValueError):
+        raise RepriceError("invalid JSON Lines export") from None
+    if not isinstance(header, dict):
+        raise RepriceError("invalid JSON Lines export")
+    return _order(header), (line for line in stream if line.strip())
+
+
+def _price_lines(lines, counts: dict, tariff, precise: bool) -> None:
+    """Adds the old and new totals of parsed lines to counts, where lines
+    from an imprecise export are not counted as changed"""
+    for line in lines:
+        if isinstance(line, RepriceError):
+            counts["errors"] += 1
+            continue
+
+        quote, total = line
+        if quote is None:
+            counts["unpriced"] += 1
+            price = total
+        else:
+            try:
+                price = pricing.quote_total(quote, tariff=tariff)
+            except (ArithmeticError, TypeError, ValueError):
+                counts["errors"] += 1
+                continue
+            if price != total:
+                counts["changed" if precise else "imprecise"] += 1
+
+        counts["lines"] += 1
+        counts["old_total"] += total
+        counts["new_total"] += price
+
+
+def _new_result(path: str) -> dict:
+    result = dict.fromkeys(DIFF_FIELDS, 0)
+    result["file"] = path
+    result["order"] = None
+    return result
+
+
+def _failed(path: str, error: Exception) -> dict:
+    result = _new_result(path)
+    result["errors"] = 1
+    result["error"] = str(error)
+    return result
+
+
+def _finish(result: dict, order: dict) -> dict:
+    """Completes a file's result once all of its lines are priced"""
+    result["order"] = order["order"]
+    if order["subtotal"] is not None:
+        result["old_total"] = order["subtotal"]
+    result["difference"] = result["new_total"] - result["old_total"]
+    return result
+
+
+def reprice_file(path: str, tariff: pricing.Tariff = None) -> dict:
+    """Returns the old and new totals of one exported order"""
+    result = _new_result(path)
+    try:
+        format = export_format(path)
+        with open(path, newline="", encoding="utf-8") as stream:
+            order, rows = _read(stream, format)
+            lines = _parse_each(PARSERS[format], rows)
+            _price_lines(lines, result, tariff, format != "text")
+    except (OSError, UnicodeDecodeError, RepriceError) as error:
+        return _failed(path, error)
+    return _finish(result, order)
+
+
+def _reprice_files(paths: list, tariff: pricing.Tariff) -> list:
+    return [reprice_file(path, tariff) for path in paths]
+
+
+def _reprice_part(format: str, rows: list, tariff: pricing.Tariff) -> dict:
+    """Returns the line counts and totals for part of a split file"""
+    counts = dict.fromkeys(LINE_FIELDS, 0)
+    lines = _parse_each(PARSERS[format], rows)
+    _price_lines(lines, counts, tariff, format != "text")
+    return counts
+
+
+def find_exports(paths: list):
+    """Yields export files, searching directories recursively"""
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for directory, _, names in sorted(os.walk(path)):
+            for name in sorted(names):
+                extension = os.path.splitext(name)[1].lstrip(".").lower()
+                if extension in FILE_FORMATS:
+                    yield os.path.join(directory, name)
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:  # Reported when the file is priced
+        return 0
+
+
+def _tasks(paths, chunk_size: int, tariff: pricing.Tariff):
+    """Yields (task, handler) pairs for the pool, where task is a function
+    and its arguments, or None, and handler takes the task's return value
+    and returns the finished results"""
+    batch = []
+    for path in paths:
+        if _file_size(path) <= SPLIT_SIZE:
+            batch.append(path)
+            if len(batch) == chunk_size:
+                yield (_reprice_files, (batch, tariff)), list
+                batch = []
+            continue
+
+        if batch:
+            yield (_reprice_files, (batch, tariff)), list
+            batch = []
+        yield from _split_tasks(path, tariff)
+
+    if batch:
+        yield (_reprice_files, (batch, tariff)), list
+
+
+def _split_tasks(path: str, tariff: pricing.Tariff):
+    """Yields tasks pricing a large file PART_LINES lines at a time, read
+    here so its parts can go to different workers"""
+    result = _new_result(path)
+
+    def merge(counts: dict) -> tuple:
+        for field in LINE_FIELDS:
+            result[field] += counts[field]
+        return ()
+
+    try:
+        format = export_format(path)
+        with open(path, newline="", encoding="utf-8") as stream:
+            order, rows = _read(stream, format)
+            while True:
+                part = list(itertools.islice(rows, PART_LINES))
+                if not part:
+                    break
+                yield (_reprice_part, (format, part, tariff)), merge
+    except (OSError, UnicodeDecodeError, RepriceError) as error:
+        yield None, lambda _: [_failed(path, error)]
+        return
+
+    yield None, lambda _: [_finish(result, order)]
+
+
+def reprice(
+    paths,
+    workers: int = None,
+    chunk_size: int = CHUNK_SIZE,
+    tariff: pricing.Tariff = None,
+):
+    """Yields reprice_file results in input order, using a process pool
+    unless a single worker is requested
+
+    Files are sent to workers chunk_size at a time, except those over
+    SPLIT_SIZE, which are read here and priced in parts. Only a few tasks
+    per worker are queued at once, so a large file is never held whole.
+    """
+    if workers == 1:
+        for path in paths:
+            yield reprice_file(path, tariff)
+        return
+
+    limit = 2 * (workers or os.cpu_count() or 1)
+    pending = collections.deque()
+    with multiprocessing.Pool(workers) as pool:
+        for task, handler in _tasks(paths, chunk_size, tariff):
+            if task is not None:
+                task = pool.apply_async(*task)
+            pending.append((task, handler))
+            while len(pending) > limit:
+                yield from _collect(*pending.popleft())
+
+        while pending:
+            yield from _collect(*pending.popleft())
+
+
+def _collect(task, handler) -> list:
+    return handler(None if task is None else task.get())
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Re-price exported orders with the current prices."
+    )
+    parser.add_argument(
+        "paths", nargs="+", help="export files or directories of exports"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="worker processes (default: one per CPU)",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=CHUNK_SIZE,
+        help=f"files sent to a worker at a time (default: {CHUNK_SIZE})",
+    )
+    cli.add_tariff_arguments(parser)
+    parser.add_argument(
+        "--output", help="write the diff to a file instead of stdout"
+    )
+    args = parser.parse_args(argv)
+    tariff = cli.load_tariff(parser, args)
+
+    output = (
+        sys.stdout
+        if args.output is None
+        else open(args.output, "w", newline="", encoding="utf-8")
+    )
+    writer = csv.DictWriter(output, DIFF_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+
+    orders = old_total = new_total = failures = 0
+    try:
+        for result in reprice(
+            find_exports(args.paths), args.workers, args.chunk_size, tariff
+        ):
+            writer.writerow(result)
+            if "error" in result:
+                failures += 1
+                sys.stderr.write(f"{result['file']}: {result['error']}\n")
+                continue
+            orders += 1
+            old_total += result["old_total"]
+            new_total += result["new_total"]
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    sys.stderr.write(
+        f"{orders} orders re-priced: {pricing.display_pounds(old_total)} -> "
+        f"{pricing.display_pounds(new_total)}\n"
+    )
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,313 @@
+"""Local HTTP quoting service
+
+Serves the same pricing rules as the Tk application over HTTP/1.1 with
+keep-alive, using only asyncio and the headless modules.
+
+    POST /quote   a single gift specification object
+    POST /quotes  a list of specifications, priced as one batch
+    POST /export  {"order": 1, "format": "text", "quotes": [...]}
+    GET  /health
+
+Specifications use the same fields as cli.py. Prices come from the
+store's tariff, and a tariff file given with --tariffs is checked for
+changes while the service runs.
+
+    python service.py --port 8080
+    python service.py --tariffs tariffs.json --store Winchester
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import sys
+import time
+import traceback
+
+import cli
+import export
+import pricing
+import tariffs
+
+MAX_BODY_SIZE = 16 * 1024 * 1024  # Bytes
+IDLE_TIMEOUT = 30  # Seconds a keep-alive connection may sit idle
+TARIFF_POLL_INTERVAL = 2  # Seconds between tariff file checks
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    411: "Length Required",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+}
+CONTENT_TYPES = {
+    "text": "text/plain; charset=utf-8",
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson",
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+def _price(row, tariff: pricing.Tariff) -> tuple:
+    """Returns (quote, total) for a single specification"""
+    if not isinstance(row, dict):
+        raise cli.SpecError("specification is not an object")
+    quote = cli.parse_spec(row, tariff.max_size)
+    return quote, pricing.quote_total(quote, tariff=tariff)
+
+
+def _result(row, tariff: pricing.Tariff) -> dict:
+    """Returns the priced result for a single specification"""
+    quote, total = _price(row, tariff)
+    return {"total": total, "summary": pricing.summarise(quote, total)}
+
+
+class QuoteService:
+    """Answers quoting requests with one store's tariff, which follows
+    changes to the tariff table when one is given"""
+
+    def __init__(
+        self,
+        tariff: pricing.Tariff = pricing.DEFAULT_TARIFF,
+        table: tariffs.TariffTable = None,
+    ) -> None:
+        self.tariff = tariff
+        self.table = table
+        self.routes = {
+            "/quote": self._quote,
+            "/quotes": self._quotes,
+            "/export": self._export,
+            "/health": self._health,
+        }
+
+    async def serve(self, host: str, port: int) -> None:
+        server = await asyncio.start_server(self.handle, host, port)
+        if self.table is not None:
+            poll = asyncio.create_task(self._poll_tariffs())
+        async with server:
+            try:
+                await server.serve_forever()
+            finally:
+                if self.table is not None:
+                    poll.cancel()
+
+    async def _poll_tariffs(self) -> None:
+        while True:
+            try:
+                self.table.reload()
+            except tariffs.TariffError as error:
+                sys.stderr.write(f"Keeping current prices: {error}\n")
+            else:
+                self.tariff = self.table.tariff
+            await asyncio.sleep(TARIFF_POLL_INTERVAL)
+
+    async def handle(self, reader, writer) -> None:
+        """Answers requests on one connection until either side closes it"""
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(
+                        self._read_request(reader), IDLE_TIMEOUT
+                    )
+                except HTTPError as error:
+                    await self._respond(
+                        writer, error.status, {"error": str(error)}, False
+                    )
+                    break
+
+                if request is None:
+                    break
+
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+
+                try:
+                    status, payload, content_type = self._dispatch(
+                        method, path, body
+                    )
+                except HTTPError as error:
+                    status, payload = error.status, {"error": str(error)}
+                    content_type = None
+                except Exception:
+                    traceback.print_exc()
+                    status, payload = 500, {"error": "internal error"}
+                    content_type = None
+
+                await self._respond(
+                    writer, status, payload, keep_alive, content_type
+                )
+                if not keep_alive:
+                    break
+
+        except (
+            asyncio.TimeoutError,
+            asyncio.IncompleteReadError,
+            ConnectionError,
+        ):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        """Returns (method, path, headers, body), or None at end of stream"""
+        request_line = await reader.readline()
+        if not request_line.strip():
+            return None
+
+        try:
+            method, path, _ = request_line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "malformed request line") from None
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if "transfer-encoding" in headers:
+            raise HTTPError(411, "chunked bodies are not supported")
+
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            raise HTTPError(400, "invalid Content-Length") from None
+        if length < 0:
+            raise HTTPError(400, "invalid Content-Length")
+        if length > MAX_BODY_SIZE:
+            raise HTTPError(413, "request body too large")
+
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), path.split("?", 1)[0], headers, body
+
+    async def _respond(
+        self,
+        writer,
+        status: int,
+        payload,
+        keep_alive: bool,
+        content_type: str = None,
+    ) -> None:
+        if content_type is None:
+            content_type = "application/json"
+            payload = json.dumps(payload)
+        body = payload.encode("utf-8")
+
+        head = (
+            f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+            "\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    def _dispatch(self, method: str, path: str, body: bytes):
+        """Returns (status, payload, content type) for a request"""
+        try:
+            route = self.routes[path]
+        except KeyError:
+            raise HTTPError(404, f"no such endpoint: {path}") from None
+
+        if path == "/health":
+            if method != "GET":
+                raise HTTPError(405, "use GET")
+            return route(None)
+
+        if method != "POST":
+            raise HTTPError(405, "use POST")
+
+        try:
+            data = json.loads(body or b"null")
+        except ValueError:
+            raise HTTPError(400, "body is not valid JSON") from None
+        return route(data)
+
+    # Endpoints
+    def _health(self, data):
+        return 200, {"status": "ok"}, None
+
+    def _quote(self, data):
+        try:
+            return 200, _result(data, self.tariff), None
+        except cli.SpecError as error:
+            raise HTTPError(400, str(error)) from None
+
+    def _quotes(self, data):
+        if not isinstance(data, list):
+            raise HTTPError(400, "expected a list of specifications")
+
+        tariff = self.tariff
+        results = []
+        for row in data:
+            try:
+                results.append(_result(row, tariff))
+            except cli.SpecError as error:
+                results.append({"error": str(error)})
+        return 200, results, None
+
+    def _export(self, data):
+        if not isinstance(data, dict) or not isinstance(
+            data.get("quotes"), list
+        ):
+            raise HTTPError(400, "expected an object with a quotes list")
+
+        format = data.get("format", "text")
+        if format not in export.FORMATS:
+            raise HTTPError(400, f"unknown export format: {format!r}")
+
+        tariff = self.tariff
+        lines = []
+        for index, row in enumerate(data["quotes"]):
+            try:
+                quote, total = _price(row, tariff)
+            except cli.SpecError as error:
+                raise HTTPError(400, f"quote {index}: {error}") from None
+            lines.append((quote, total, pricing.summarise(quote, total)))
+
+        stream = io.StringIO()
+        export.write_order(
+            stream,
+            lines,
+            order_id=data.get("order", 1),
+            items=len(lines),
+            subtotal=sum(line[1] for line in lines),
+            store=tariff.store,
+            datestamp=time.strftime("%d-%m-%y"),
+            format=format,
+        )
+        return 200, stream.getvalue(), CONTENT_TYPES[format]
+
+
+def main(argv: list = None) -> None:
+    parser = argparse.ArgumentParser(description="Serve quotes over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    cli.add_tariff_arguments(parser)
+    args = parser.parse_args(argv)
+    tariff = cli.load_tariff(parser, args)
+
+    if tariff is None:
+        service = QuoteService(pricing.Tariff(args.store))
+    else:
+        table = tariffs.TariffTable(args.tariffs, args.store)
+        service = QuoteService(tariff, table)
+
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
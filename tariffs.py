@@ -0,0 +1,200 @@
+"""Per-store price tables loaded from a local file
+
+A tariff file is a JSON object holding prices shared by every store and
+the prices each store overrides. Anything left out falls back to the
+built-in prices in pricing.py, and a table's own store uses the shared
+prices when it is not listed.
+
+    {
+        "defaults": {"prices": {"0": 0.4, "1": 0.75}, "overlap": 3},
+        "stores": {
+            "Winchester": {},
+            "Basingstoke": {"bow_price": 175, "max_size": 300}
+        }
+    }
+
+Every store is validated and compiled into an immutable pricing.Tariff
+when the file is loaded, so pricing a quote only reads its attributes.
+"""
+import json
+import math
+import os
+import threading
+
+import pricing
+
+FIELDS = (
+    "prices",
+    "bow_price",
+    "label_price",
+    "label_character_price",
+    "overlap",
+    "max_size",
+)
+
+
+class TariffError(ValueError):
+    """Raised when a tariff file cannot be loaded"""
+
+
+def _number(store: str, field: str, value, minimum: float = 0) -> float:
+    if (
+        isinstance(value, bool)
+        or not isinstance(value, (int, float))
+        or not math.isfinite(value)
+        or value < minimum
+    ):
+        raise TariffError(
+            f"{store}: {field} must be a number of at least {minimum}"
+        )
+    return value
+
+
+def _pence(store: str, field: str, value) -> int:
+    if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+        raise TariffError(f"{store}: {field} must be a whole number of pence")
+    return value
+
+
+def _prices(store: str, value) -> tuple:
+    """Returns paper prices as a tuple indexed by quality"""
+    if not isinstance(value, dict):
+        raise TariffError(f"{store}: prices must map qualities to prices")
+
+    prices = {}
+    for quality, price in value.items():
+        try:
+            quality = int(quality)
+        except ValueError:
+            raise TariffError(
+                f"{store}: invalid paper quality {quality!r}"
+            ) from None
+        prices[quality] = _number(store, f"price {quality}", price)
+
+    if set(prices) != set(pricing.PRICES):
+        raise TariffError(
+            f"{store}: prices needed for qualities "
+            f"{', '.join(str(quality) for quality in sorted(pricing.PRICES))}"
+        )
+    return tuple(prices[quality] for quality in sorted(prices))
+
+
+def compile_tariff(
+    store: str, settings: dict, base: pricing.Tariff = None
+) -> pricing.Tariff:
+    """Returns a validated tariff, taking missing settings from the base"""
+    base = pricing.DEFAULT_TARIFF if base is None else base
+    if not isinstance(settings, dict):
+        raise TariffError(f"{store}: expected an object of prices")
+
+    unknown = set(settings) - set(FIELDS)
+    if unknown:
+        raise TariffError(f"{store}: unknown settings {sorted(unknown)}")
+
+    def setting(field: str):
+        return settings.get(field, getattr(base, field))
+
+    prices = settings.get("prices")
+    return pricing.Tariff(
+        store,
+        base.prices if prices is None else _prices(store, prices),
+        _pence(store, "bow_price", setting("bow_price")),
+        _pence(store, "label_price", setting("label_price")),
+        _pence(
+            store, "label_character_price", setting("label_character_price")
+        ),
+        _number(store, "overlap", setting("overlap")),
+        _number(store, "max_size", setting("max_size"), minimum=1),
+    )
+
+
+def parse(data: dict, store: str = pricing.STORE) -> dict:
+    """Returns compiled tariffs keyed by store, always including the given
+    store"""
+    if not isinstance(data, dict):
+        raise TariffError("a tariff file must contain a JSON object")
+
+    unknown = set(data) - {"defaults", "stores"}
+    if unknown:
+        raise TariffError(f"unknown sections {sorted(unknown)}")
+
+    base = compile_tariff("defaults", data.get("defaults", {}))
+    stores = data.get("stores", {})
+    if not isinstance(stores, dict):
+        raise TariffError("stores must map store names to prices")
+
+    tariffs = {
+        name: compile_tariff(name, settings, base)
+        for name, settings in stores.items()
+    }
+    if store not in tariffs:
+        tariffs[store] = compile_tariff(store, {}, base)
+    return tariffs
+
+
+def load(path: str, store: str = pricing.STORE) -> dict:
+    """Returns compiled tariffs keyed by store for a tariff file"""
+    try:
+        with open(path, encoding="utf-8") as stream:
+            data = json.load(stream)
+    except ValueError as error:
+        raise TariffError(f"{path}: {error}") from None
+    return parse(data, store)
+
+
+class TariffTable:
+    """Compiled tariffs from a file, reloaded when the file changes
+
+    Nothing is read until the first reload. A file that fails to load
+    leaves the previous tariffs in force, and while there is no file every
+    store uses the built-in prices.
+    """
+
+    def __init__(self, path: str, store: str = pricing.STORE) -> None:
+        self.path = path
+        self.store = store
+        self._lock = threading.Lock()
+        self._signature = None
+        self._tariffs = {store: pricing.Tariff(store)}
+
+    @property
+    def tariff(self) -> pricing.Tariff:
+        """Returns the tariff of this installation's store"""
+        return self._tariffs[self.store]
+
+    @property
+    def stores(self) -> list:
+        return sorted(self._tariffs)
+
+    def get(self, store: str) -> pricing.Tariff:
+        try:
+            return self._tariffs[store]
+        except KeyError:
+            raise TariffError(f"no tariff for store {store!r}") from None
+
+    def reload(self) -> bool:
+        """Reloads the file if it changed, returning whether the tariffs
+        did, and raising TariffError if the new file is invalid"""
+        with self._lock:
+            try:
+                status = os.stat(self.path)
+            except FileNotFoundError:
+                signature = None
+            else:
+                signature = (status.st_mtime_ns, status.st_size)
+
+            if signature == self._signature:
+                return False
+            self._signature = signature
+
+            if signature is None:
+                tariffs = {self.store: pricing.Tariff(self.store)}
+            else:
+                try:
+                    tariffs = load(self.path, self.store)
+                except OSError as error:
+                    raise TariffError(f"{self.path}: {error}") from None
+
+            changed = tariffs != self._tariffs
+            self._tariffs = tariffs
+            return changed